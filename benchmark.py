@@ -0,0 +1,547 @@
+"""Offline throughput benchmark for the roster processor
+
+Runs process_pdfs() on a corpus of sample PDFs and synthetic multi-team packets, with the
+OpenAI API replaced by a local stub that replays recorded responses after a configurable
+delay. Nothing is sent over the network and no API credit is used.
+
+    python benchmark.py [--sizes 1,4,16] [--latency 0.8] [--jitter 0.4] [--jobs N] [--runs N]
+                        [--corpus DIR] [--responses FILE] [--record FILE] [--ai-only] [--cache]
+                        [--json FILE]
+
+'python benchmark.py startup [--runs N] [--max-startup S]' instead times the launcher's no-op
+paths and fails if they import any heavy dependency or take longer than S seconds.
+
+'python benchmark.py batch [--sizes 1,4,16] [--polls N] [--verbose]' runs batch-submit and
+batch-collect against a local stand-in for the Batch API's /files and /batches endpoints and
+fails unless every file ends up in 'complete' with its InDesign files written.
+"""
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zlib
+import hashlib
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import httpx
+
+import main
+
+SCHOOLS = ["Lincoln", "Roosevelt", "Jefferson", "Madison", "Franklin", "Washington", "Hamilton", "Adams"]
+SPORTS = ["Varsity Football", "Varsity Basketball", "JV Volleyball", "Varsity Soccer", "Freshman Baseball", "Varsity Wrestling"]
+FIRST_NAMES = ["Alex", "Ben", "Carlos", "Dylan", "Eli", "Finn", "Gus", "Hank", "Ian", "Jack", "Kai", "Liam"]
+LAST_NAMES = ["Smith", "Jones", "Diaz", "Moore", "Park", "Cole", "Hart", "Reed", "Nguyen", "Ortiz", "Baker", "Young"]
+POSITIONS = ["QB", "WR", "RB", "OL", "DB", "LB", "G", "F", "C", "OH", "MB", "P"]
+YEARS = ["Fr.", "So.", "Jr.", "Sr."]
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _page_stream(title, header, rows, coach, grid):
+    """PDF content stream for one roster page, optionally with ruled table lines"""
+    x0, top, col_w, row_h = 50, 720, 85, 18
+    ops = [f"BT /F1 14 Tf {x0} 750 Td ({_pdf_escape(title)}) Tj ET"]
+    table = [header] + rows
+    for r, row in enumerate(table):
+        y = top - (r + 1) * row_h
+        for c, cell in enumerate(row):
+            ops.append(f"BT /F1 9 Tf {x0 + c * col_w + 3} {y + 5} Td ({_pdf_escape(cell)}) Tj ET")
+    if grid:
+        for r in range(len(table) + 1):
+            ops.append(f"{x0} {top - r * row_h} m {x0 + len(header) * col_w} {top - r * row_h} l S")
+        for c in range(len(header) + 1):
+            ops.append(f"{x0 + c * col_w} {top} m {x0 + c * col_w} {top - len(table) * row_h} l S")
+    ops.append(f"BT /F1 10 Tf {x0} {top - (len(table) + 2) * row_h} Td ({_pdf_escape(coach)}) Tj ET")
+    return "\n".join(ops).encode("latin-1")
+
+def write_pdf(path, streams):
+    """Write a minimal PDF with one page per content stream (Helvetica only)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(streams)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(streams)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, stream in enumerate(streams):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        data = zlib.compress(stream)
+        objects.append(f"<< /Length {len(data)} /Filter /FlateDecode >>\nstream\n".encode() + data + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    Path(path).write_bytes(bytes(out))
+
+def synthetic_team(rng, index):
+    """One made-up team: (heading, page rows, coach line, roster data as the AI would return it)"""
+    school = SCHOOLS[index % len(SCHOOLS)]
+    sport = SPORTS[(index // len(SCHOOLS)) % len(SPORTS)]
+    heading = f"{school} High School {sport} Roster #{index + 1}"
+    numbers = rng.sample(range(1, 99), rng.randint(12, 24))
+    players = []
+    for number in numbers:
+        players.append({"number": str(number),
+                        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                        "position": rng.choice(POSITIONS),
+                        "height": f"{rng.randint(5, 6)}'{rng.randint(0, 11)}\"",
+                        "weight": str(rng.randint(130, 260)),
+                        "year": rng.choice(YEARS)})
+    coach = f"Head Coach: {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    rows = [[p["number"], p["name"], p["position"], p["height"], p["weight"], p["year"]] for p in players]
+    title, name = coach.split(": ", 1)
+    data = {"sport": f"{school} {sport}", "players": players, "coaches": [{"title": title, "name": name}]}
+    return heading, rows, coach, data
+
+def build_corpus(folder, sizes, sample_dir=None, seed=7):
+    """Write synthetic packets of the given team counts (plus any sample PDFs) into folder
+
+    Returns {team heading: team data} - the recorded answer for every synthetic team.
+    """
+    rng = random.Random(seed)
+    folder.mkdir(parents=True, exist_ok=True)
+    header = ["No.", "Name", "Pos.", "Ht.", "Wt.", "Yr."]
+    answers = {}
+    team_index = 0
+    for size in sizes:
+        streams = []
+        for _ in range(size):
+            heading, rows, coach, data = synthetic_team(rng, team_index)
+            team_index += 1
+            answers[heading] = data
+            # Text-only pages go to the AI; the ruled one-team packet exercises the local parser
+            streams.append(_page_stream(heading, header, rows, coach, grid=size == 1))
+        write_pdf(folder / f"packet_{size:03d}_teams.pdf", streams)
+    if sample_dir:
+        for path in main.list_import_files(Path(sample_dir)):
+            shutil.copy2(path, folder / path.name)
+    return answers
+
+def _chat_response(content, prompt_tokens, completion_tokens):
+    return {"id": "chatcmpl-benchmark", "object": "chat.completion", "created": int(time.time()),
+            "model": main.AI_MODEL,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}}
+
+def _chat_stream(content, prompt_tokens, completion_tokens, delay, pieces=20):
+    """Server-sent events for a streamed reply: a fifth of the delay before the first token, the rest spread out"""
+    def events():
+        time.sleep(delay * 0.2)
+        size = max(1, len(content) // pieces)
+        base = {"id": "chatcmpl-benchmark", "object": "chat.completion.chunk", "created": int(time.time()), "model": main.AI_MODEL}
+        for start in range(0, len(content), size):
+            time.sleep(delay * 0.8 / pieces)
+            delta = {"content": content[start:start + size]}
+            yield f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': delta, 'finish_reason': None}]))}\n\n".encode()
+        yield f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))}\n\n".encode()
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        yield f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+    return events()
+
+def prompt_fingerprint(body):
+    """Key a recorded response by the messages that produced it"""
+    return hashlib.sha256(json.dumps(body.get("messages"), sort_keys=True).encode("utf-8")).hexdigest()
+
+class ReplayStub:
+    """httpx transport handler that answers chat completions from recordings after a delay
+
+    A request is answered from the recordings file when its messages match exactly, otherwise
+    from the synthetic teams whose headings appear in the prompt. Anything else gets an empty
+    roster, which the processor reports as a failed file.
+    """
+    def __init__(self, recordings, answers, latency, jitter, seed=7):
+        self.recordings = recordings
+        self.answers = answers
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.misses = 0
+
+    def answer(self, body):
+        """(reply content, prompt tokens, completion tokens) for a chat completion request body"""
+        prompt = body["messages"][-1]["content"]
+        content = self.recordings.get(prompt_fingerprint(body))
+        if content is None:
+            teams = [data for heading, data in self.answers.items() if heading in prompt]
+            content = json.dumps({"type": "roster", "teams": teams})
+            if not teams:
+                with self.lock:
+                    self.misses += 1
+        with self.lock:
+            self.requests += 1
+        return content, main.count_tokens(prompt), main.count_tokens(content)
+
+    def __call__(self, request):
+        body = json.loads(request.content)
+        content, *tokens = self.answer(body)
+        with self.lock:
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+        if body.get("stream"):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                                  content=_chat_stream(content, *tokens, delay))
+        time.sleep(delay)
+        return httpx.Response(200, json=_chat_response(content, *tokens))
+
+class BatchApiStub:
+    """httpx transport handler standing in for the Batch API's /files and /batches endpoints
+
+    Uploaded request files are kept in memory. A batch moves from 'validating' to 'in_progress'
+    on its first retrieve and completes on retrieve number `polls`, when every request is answered
+    by `replay` (a ReplayStub) and written to an output file.
+    """
+    def __init__(self, replay, polls=2):
+        self.replay = replay
+        self.polls = polls
+        self.files = {}
+        self.batches = {}
+        self.uploads = 0
+        self.retrieves = 0
+
+    def _file_object(self, file_id):
+        return {"id": file_id, "object": "file", "bytes": len(self.files[file_id]), "created_at": int(time.time()),
+                "filename": f"{file_id}.jsonl", "purpose": "batch", "status": "processed"}
+
+    def _batch_object(self, batch):
+        done = len(batch["requests"]) if batch["status"] == "completed" else 0
+        return {"id": batch["id"], "object": "batch", "endpoint": "/v1/chat/completions",
+                "input_file_id": batch["input_file_id"], "completion_window": "24h", "status": batch["status"],
+                "created_at": batch["created_at"], "output_file_id": batch.get("output_file_id"), "error_file_id": None,
+                "request_counts": {"total": len(batch["requests"]), "completed": done, "failed": 0}}
+
+    def _upload(self, request):
+        boundary = request.headers["content-type"].split("boundary=", 1)[1].strip('"').encode()
+        for part in request.content.split(b"--" + boundary):
+            head, _, data = part.partition(b"\r\n\r\n")
+            if b'name="file"' in head:
+                file_id = f"file-stub-{len(self.files) + 1}"
+                self.files[file_id] = data[:-2]  # the part ends with CRLF before the next boundary
+                self.uploads += 1
+                return httpx.Response(200, json=self._file_object(file_id))
+        return httpx.Response(400, json={"error": {"message": "no file in upload"}})
+
+    def _complete(self, batch):
+        lines = []
+        for request in batch["requests"]:
+            content, prompt_tokens, completion_tokens = self.replay.answer(request["body"])
+            lines.append(json.dumps({"id": f"batch_req_{request['custom_id']}", "custom_id": request["custom_id"],
+                                     "response": {"status_code": 200, "request_id": request["custom_id"],
+                                                  "body": _chat_response(content, prompt_tokens, completion_tokens)},
+                                     "error": None}))
+        batch["output_file_id"] = f"file-stub-{len(self.files) + 1}"
+        self.files[batch["output_file_id"]] = "\n".join(lines).encode("utf-8")
+        batch["status"] = "completed"
+
+    def __call__(self, request):
+        path = request.url.path.rstrip("/")
+        if path.endswith("/files") and request.method == "POST":
+            return self._upload(request)
+        if path.endswith("/batches") and request.method == "POST":
+            body = json.loads(request.content)
+            if body["input_file_id"] not in self.files:
+                return httpx.Response(404, json={"error": {"message": f"no file {body['input_file_id']}"}})
+            batch = {"id": f"batch-stub-{len(self.batches) + 1}", "input_file_id": body["input_file_id"],
+                     "status": "validating", "created_at": int(time.time()), "retrieves": 0,
+                     "requests": [json.loads(line) for line in self.files[body["input_file_id"]].splitlines() if line.strip()]}
+            self.batches[batch["id"]] = batch
+            return httpx.Response(200, json=self._batch_object(batch))
+        parts = path.split("/")
+        if parts[-2] == "batches" and parts[-1] in self.batches:
+            batch = self.batches[parts[-1]]
+            batch["retrieves"] += 1
+            self.retrieves += 1
+            if batch["status"] != "completed":
+                if batch["retrieves"] >= self.polls:
+                    self._complete(batch)
+                else:
+                    batch["status"] = "in_progress"
+            return httpx.Response(200, json=self._batch_object(batch))
+        if parts[-1] == "content" and parts[-2] in self.files:
+            return httpx.Response(200, content=self.files[parts[-2]])
+        return httpx.Response(404, json={"error": {"message": f"stub has no route for {request.method} {path}"}})
+
+class RecordingTransport(httpx.HTTPTransport):
+    """Pass requests through to the real API and keep each chat completion for later replay"""
+    def __init__(self, recordings):
+        super().__init__()
+        self.recordings = recordings
+        self.lock = threading.Lock()
+
+    def handle_request(self, request):
+        response = super().handle_request(request)
+        if request.url.path.endswith("/chat/completions") and response.status_code == 200:
+            response.read()
+            if response.headers.get("content-type", "").startswith("text/event-stream"):
+                events = [line[6:] for line in response.text.splitlines() if line.startswith("data: ")]
+                chunks = [json.loads(event) for event in events if event != "[DONE]"]
+                content = "".join(c["choices"][0]["delta"].get("content") or "" for c in chunks if c["choices"])
+            else:
+                content = response.json()["choices"][0]["message"]["content"]
+            with self.lock:
+                self.recordings[prompt_fingerprint(json.loads(request.content))] = content
+        return response
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))]
+
+def stage_percentiles(records):
+    """{stage: {"p50", "p90", "p99", "max"}} over the files that ran each stage"""
+    stages = [s for s in main.METRICS_STAGES if any(s in r["stages"] for r in records)]
+    stages += sorted({s for r in records for s in r["stages"]} - set(stages))
+    table = {}
+    for stage in stages:
+        times = [r["stages"][stage] for r in records if stage in r["stages"]]
+        table[stage] = {"files": len(times), "p50": percentile(times, 0.5), "p90": percentile(times, 0.9),
+                        "p99": percentile(times, 0.99), "max": max(times)}
+    return table
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its largest finished child (extraction workers)"""
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024  # ru_maxrss is KiB on Linux, bytes on macOS
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return own, children
+
+def _reset_folders(corpus):
+    """Start from an import/ folder holding a fresh copy of the corpus and no earlier output"""
+    for folder in ("import", "complete", "in_design_output"):
+        shutil.rmtree(folder, ignore_errors=True)
+    shutil.copytree(corpus, "import")
+
+def run_once(corpus, jobs, verbose=False):
+    """Copy the corpus into import/, process it, and return (wall seconds, per-file metrics records, output count)"""
+    _reset_folders(corpus)
+    for old in main.METRICS_DIR.glob("run_*.jsonl"):
+        old.unlink()
+
+    started = time.perf_counter()
+    if verbose:
+        main.process_pdfs(jobs=jobs)
+    else:
+        with redirect_stdout(io.StringIO()):
+            main.process_pdfs(jobs=jobs)
+    wall = time.perf_counter() - started
+
+    metrics_file = max(main.METRICS_DIR.glob("run_*.jsonl"))
+    lines = [json.loads(line) for line in metrics_file.read_text(encoding="utf-8").splitlines()]
+    outputs = len(list(Path("in_design_output").glob("*.txt")))
+    return wall, [line for line in lines if "summary" not in line], outputs
+
+# A submodule per heavy dependency that is only present once the dependency has really been
+# imported - main.py registers the top-level modules lazily, so their names alone prove nothing
+HEAVY_MODULE_MARKERS = {
+    "openai": "openai._client", "httpx": "httpx._client", "pdfplumber": "pdfplumber.page",
+    "pdfminer": "pdfminer.psparser", "Pillow": "PIL._imaging", "pytesseract": "pytesseract.pytesseract",
+    "multiprocessing": "multiprocessing.queues", "tiktoken": "tiktoken.core", "watchdog": "watchdog.observers",
+}
+STARTUP_SCENARIOS = {"usage message": ["--help"], "empty import folder": []}
+
+def _heavy_modules_loaded(script, argv, cwd):
+    """Run main.py with argv in-process under a probe and list the heavy dependencies it imported"""
+    probe = (f"import json, runpy, sys\n"
+             f"sys.argv = [{str(script)!r}] + {argv!r}\n"
+             f"try:\n    runpy.run_path({str(script)!r}, run_name='__main__')\n"
+             f"except SystemExit:\n    pass\n"
+             f"markers = {HEAVY_MODULE_MARKERS!r}\n"
+             f"print(json.dumps([name for name, marker in markers.items() if marker in sys.modules]))\n")
+    result = subprocess.run([sys.executable, "-c", probe], cwd=cwd, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def startup_benchmark(runs=10, max_seconds=None):
+    """Time main.py's no-op paths in fresh interpreters; returns False when a check fails"""
+    script = Path(__file__).resolve().parent / "main.py"
+    ok = True
+    with tempfile.TemporaryDirectory(prefix="roster_startup_") as workdir:
+        (Path(workdir) / "import").mkdir()
+        baseline = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "pass"], cwd=workdir)
+            baseline.append(time.perf_counter() - started)
+        print(f"⏱️  Bare interpreter: {statistics.median(baseline) * 1000:.0f} ms median over {runs} run(s)")
+        
+        for label, argv in STARTUP_SCENARIOS.items():
+            times = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                subprocess.run([sys.executable, str(script), *argv], cwd=workdir, capture_output=True)
+                times.append(time.perf_counter() - started)
+            median = statistics.median(times)
+            loaded = _heavy_modules_loaded(script, argv, workdir)
+            print(f"⏱️  {label}: {median * 1000:.0f} ms median, {min(times) * 1000:.0f} ms best"
+                  f" - heavy imports: {', '.join(loaded) or 'none'}")
+            if loaded:
+                print(f"❌ {label} imported {', '.join(loaded)} - these should load on first use")
+                ok = False
+            if max_seconds is not None and median > max_seconds:
+                print(f"❌ {label} took {median:.3f}s, over the {max_seconds:.3f}s budget")
+                ok = False
+    return ok
+
+def batch_cycle(sizes, polls=2, verbose=False):
+    """Run batch-submit, then batch-collect until the job is done, against BatchApiStub
+
+    Returns False when a file is left in 'import', a team has no output, or the job never finishes.
+    """
+    start_dir = Path.cwd()
+    workdir = Path(tempfile.mkdtemp(prefix="roster_batch_"))
+    os.chdir(workdir)
+    try:
+        answers = build_corpus(workdir / "corpus", sizes)
+        _reset_folders(workdir / "corpus")
+        stub = BatchApiStub(ReplayStub({}, answers, latency=0, jitter=0), polls)
+        main.openai.api_key = main.openai.api_key or "sk-benchmark"
+        main.configure_openai_client(transport=httpx.MockTransport(stub))
+        main.AI_CACHE_MODE = "off"
+        output = io.StringIO()
+        with redirect_stdout(sys.stdout if verbose else output):
+            main.submit_batch_job()
+            collects = 0
+            while main._batch_job_states() and collects <= polls:
+                main.collect_batch_jobs()
+                collects += 1
+        
+        left = sorted(path.name for path in Path("import").iterdir())
+        outputs = list(Path("in_design_output").iterdir())
+        print(f"📦 Batch cycle: {stub.uploads} upload(s), {len(stub.batches)} batch(es), "
+              f"{sum(len(b['requests']) for b in stub.batches.values())} request(s), {stub.retrieves} poll(s), "
+              f"{collects} collect run(s)")
+        print(f"   {len(list(Path('complete').iterdir()))} file(s) completed, {len(left)} left in 'import', "
+              f"{len(outputs)} InDesign file(s) for {len(answers)} team(s)")
+        ok = True
+        if main._batch_job_states():
+            print(f"❌ Batch job still open after {collects} collect run(s)")
+            ok = False
+        if left:
+            print(f"❌ Left in 'import': {', '.join(left)}")
+            ok = False
+        if len(outputs) != len(answers):
+            print(f"❌ Expected {len(answers)} InDesign file(s), found {len(outputs)}")
+            ok = False
+        if not ok and not verbose:
+            print(output.getvalue())
+        return ok
+    finally:
+        os.chdir(start_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def print_report(run, wall, records, stub):
+    ok = sum(1 for r in records if r.get("success"))
+    own_rss, child_rss = peak_rss_mb()
+    print(f"\n📊 Run {run}: {len(records)} file(s) in {wall:.2f}s - {len(records) / wall:.2f} files/sec ({ok} succeeded)")
+    print(f"   {'Stage':<16}{'Files':>6}{'p50 s':>9}{'p90 s':>9}{'p99 s':>9}{'Max s':>9}")
+    for stage, row in stage_percentiles(records).items():
+        print(f"   {stage:<16}{row['files']:>6}{row['p50']:>9.3f}{row['p90']:>9.3f}{row['p99']:>9.3f}{row['max']:>9.3f}")
+    print(f"   AI calls: {sum(r['ai_calls'] for r in records)} | AI cache hits: {sum(r['ai_cache_hits'] for r in records)}"
+          f" | Page cache hits: {sum(r['page_cache_hits'] for r in records)}")
+    if stub is not None:
+        print(f"   Stub requests: {stub.requests} ({stub.misses} without a recorded answer)")
+    print(f"   Peak RSS: {own_rss:.1f} MB main process, {child_rss:.1f} MB largest extraction worker")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["startup"]:
+        runs = int(main._pop_option(args, "--runs", "10"))
+        budget = main._pop_option(args, "--max-startup")
+        passed = startup_benchmark(runs, float(budget) if budget else None)
+        print("✅ Startup checks passed" if passed else "❌ Startup checks failed")
+        sys.exit(0 if passed else 1)
+    if args[:1] == ["batch"]:
+        sizes = [int(size) for size in main._pop_option(args, "--sizes", "1,4,16").split(",")]
+        polls = int(main._pop_option(args, "--polls", "2"))
+        passed = batch_cycle(sizes, polls, main._pop_flag(args, "--verbose"))
+        print("✅ Batch API cycle passed" if passed else "❌ Batch API cycle failed")
+        sys.exit(0 if passed else 1)
+    sizes = [int(size) for size in main._pop_option(args, "--sizes", "1,4,16").split(",")]
+    latency = float(main._pop_option(args, "--latency", "0.8"))
+    jitter = float(main._pop_option(args, "--jitter", "0.4"))
+    jobs = int(main._pop_option(args, "--jobs", main.BATCH_JOBS))
+    runs = int(main._pop_option(args, "--runs", "1"))
+    sample_dir = main._pop_option(args, "--corpus")
+    responses_file = main._pop_option(args, "--responses")
+    record_file = main._pop_option(args, "--record")
+    json_file = main._pop_option(args, "--json")
+    ai_only = main._pop_flag(args, "--ai-only")
+    keep_cache = main._pop_flag(args, "--cache")
+    verbose = main._pop_flag(args, "--verbose")
+    if args:
+        print("Usage: python benchmark.py [--sizes 1,4,16] [--latency S] [--jitter S] [--jobs N] [--runs N]")
+        print("                           [--corpus DIR] [--responses FILE] [--record FILE] [--ai-only] [--cache]")
+        print("                           [--json FILE] [--verbose]")
+        print("")
+        print("--responses replays recordings made with --record (which calls the real API).")
+        print("--cache keeps the AI response cache between runs; the page cache always persists across runs.")
+        sys.exit(1)
+
+    if sample_dir:
+        sample_dir = str(Path(sample_dir).resolve())
+    json_file = Path(json_file).resolve() if json_file else None
+    record_file = Path(record_file).resolve() if record_file else None
+    recordings = json.loads(Path(responses_file).read_text(encoding="utf-8")) if responses_file else {}
+
+    start_dir = Path.cwd()
+    workdir = Path(tempfile.mkdtemp(prefix="roster_benchmark_"))
+    os.chdir(workdir)
+    answers = build_corpus(workdir / "corpus", sizes, sample_dir)
+    print(f"🧪 Benchmark corpus: {len(list((workdir / 'corpus').iterdir()))} file(s), {len(answers)} synthetic team(s) in {workdir}")
+
+    stub = None
+    if record_file:
+        main.configure_openai_client(transport=RecordingTransport(recordings))
+        print("🔴 Recording real API responses - this run uses API credit")
+    else:
+        stub = ReplayStub(recordings, answers, latency, jitter)
+        main.openai.api_key = main.openai.api_key or "sk-benchmark"
+        main.configure_openai_client(transport=httpx.MockTransport(stub))
+        print(f"🔌 AI stub: {latency:.2f}s latency + up to {jitter:.2f}s jitter, {len(recordings)} recorded response(s)")
+
+    main.LOCAL_PARSE_ENABLED = not ai_only
+    main.AI_CACHE_MODE = "on" if keep_cache else "off"
+    # Every run renders the whole corpus - the team store would otherwise skip teams seen in run 1
+    main.SKIP_UNCHANGED_TEAMS = False
+
+    report = []
+    passed = True
+    try:
+        for run in range(1, runs + 1):
+            wall, records, outputs = run_once(workdir / "corpus", jobs, verbose)
+            print_report(run, wall, records, stub)
+            # Sample PDFs add outputs of their own, so only the synthetic teams are a hard count
+            if outputs < len(answers) or (not sample_dir and outputs != len(answers)):
+                print(f"❌ Run {run}: expected {len(answers)} InDesign file(s), found {outputs}")
+                passed = False
+            report.append({"run": run, "jobs": jobs, "files": len(records), "wall_seconds": round(wall, 3),
+                           "files_per_second": round(len(records) / wall, 3),
+                           "stages": stage_percentiles(records), "peak_rss_mb": peak_rss_mb()})
+    finally:
+        os.chdir(start_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if record_file:
+        Path(record_file).write_text(json.dumps(recordings, indent=2), encoding="utf-8")
+        print(f"💾 Saved {len(recordings)} recorded response(s) to {record_file}")
+    if json_file:
+        json_file.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"💾 Benchmark results written to {json_file}")
+    if not passed:
+        sys.exit(1)
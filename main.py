@@ -1,25 +1,114 @@
-import pdfplumber, openai, re, os, shutil, json
+import re, os, sys, shutil, json, time, random, threading, hashlib, importlib.util, inspect, sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import datetime
 
+def _lazy_import(name):
+    """Import a module on first attribute access, so runs that never need it don't pay its import time"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+# Heavy dependencies load on first use - the usage message and an empty 'import' folder need none of them
+pdfplumber = _lazy_import("pdfplumber")
+openai = _lazy_import("openai")
+httpx = _lazy_import("httpx")
+process_pool = _lazy_import("concurrent.futures.process")  # multiprocessing is only needed once there is work
+
 # Optional image support
-try:
-    import pytesseract
-    from PIL import Image
-    HAS_IMAGE_SUPPORT = True
-except ImportError:
-    HAS_IMAGE_SUPPORT = False
-
-# Setup
+HAS_IMAGE_SUPPORT = all(importlib.util.find_spec(name) is not None for name in ("pytesseract", "PIL"))
+if HAS_IMAGE_SUPPORT:
+    pytesseract = _lazy_import("pytesseract")
+    Image = _lazy_import("PIL.Image")
+    ImageOps = _lazy_import("PIL.ImageOps")
+
+# Optional exact token counts (otherwise estimated at ~4 characters per token)
+HAS_TIKTOKEN = importlib.util.find_spec("tiktoken") is not None
+
+# Optional filesystem events for watch mode (inotify on Linux, FSEvents on macOS)
+HAS_WATCHDOG = importlib.util.find_spec("watchdog") is not None
+
+# Setup - .env is read first because the settings below come from environment variables
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # Constants for efficiency
-SUPPORTED_IMAGE_EXTS = {}  # Images not directly supported - convert to PDF first
-AI_PROMPT_TEMPLATE = (
+SUPPORTED_IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.gif'}  # read with OCR
+
+# OCR for image files and scanned PDF pages - text is cached by a hash of the image
+OCR_CACHE_DIR = Path(os.getenv("ABC_OCR_CACHE_DIR", ".ocr_cache"))
+OCR_CACHE_MAX_MB = float(os.getenv("ABC_OCR_CACHE_MAX_MB", "50"))
+OCR_VERSION = "1"  # Bump when preprocessing changes so cached text is not reused
+OCR_MAX_SIDE = int(os.getenv("ABC_OCR_MAX_SIDE", "3000"))  # larger photos are downscaled first
+OCR_MAX_SKEW_DEGREES = float(os.getenv("ABC_OCR_MAX_SKEW", "5"))
+OCR_PDF_RESOLUTION = int(os.getenv("ABC_OCR_PDF_RESOLUTION", "300"))
+OCR_WORKERS = int(os.getenv("ABC_OCR_WORKERS", str(os.cpu_count() or 1)))
+
+# Watch mode - a file must stop changing for WATCH_SETTLE_SECONDS before it is processed
+WATCH_SETTLE_SECONDS = float(os.getenv("ABC_WATCH_SETTLE_SECONDS", "2"))
+WATCH_POLL_SECONDS = float(os.getenv("ABC_WATCH_POLL_SECONDS", "1"))
+
+# OpenAI Batch API jobs (batch-submit / batch-collect) keep their request files and progress here
+BATCH_API_DIR = Path(os.getenv("ABC_BATCH_API_DIR", "batch_jobs"))
+
+# Output profile - a JSON file overriding DEFAULT_RENDER_PROFILE's styles, columns and abbreviations.
+# COMBINED_OUTPUT also writes one file holding every team of a multi-team document.
+RENDER_PROFILE_PATH = os.getenv("ABC_RENDER_PROFILE")
+COMBINED_OUTPUT = os.getenv("ABC_COMBINED_OUTPUT", "off") == "on"
+
+# Manifest of every processed file: source hash, extracted data, outputs and renderer version (used by 'rebuild').
+# Entries are appended to a log as files finish and folded into MANIFEST_PATH once per batch.
+MANIFEST_PATH = Path(os.getenv("ABC_MANIFEST", "manifest.json"))
+_manifest_lock = threading.Lock()
+_manifest = None  # loaded on first use, then kept up to date in memory
+
+# Team store - every rendered roster/schedule, versioned by school, sport/level and season.
+# Teams identical to their stored version (or to the same team from another file) are not rendered again.
+TEAM_STORE_PATH = Path(os.getenv("ABC_TEAM_STORE", "team_store.sqlite3"))
+SKIP_UNCHANGED_TEAMS = os.getenv("ABC_SKIP_UNCHANGED", "on") == "on"
+_team_store_lock = threading.Lock()
+_team_store_conn = None
+
+# Run metrics - per-file stage timings, tokens, cost, cache hits and retries, one JSON line per file
+METRICS_DIR = Path(os.getenv("ABC_METRICS_DIR", "metrics"))
+METRICS_STAGES = ("pdf_open", "text_extraction", "ocr", "local_parse", "ai_call", "json_repair", "normalization", "file_write")
+_metrics_local = threading.local()
+
+# Concurrency settings for batch mode (override with environment variables)
+BATCH_JOBS = int(os.getenv("ABC_BATCH_JOBS", "1"))  # files processed at once; 1 = sequential
+AI_MAX_CONCURRENCY = int(os.getenv("ABC_AI_CONCURRENCY", "4"))  # OpenAI requests in flight at once
+AI_MAX_RETRIES = int(os.getenv("ABC_AI_MAX_RETRIES", "5"))
+AI_BACKOFF_SECONDS = float(os.getenv("ABC_AI_BACKOFF_SECONDS", "2"))
+_ai_slots = threading.BoundedSemaphore(max(1, AI_MAX_CONCURRENCY))
+
+# Shared OpenAI client - one keep-alive connection pool for every request in the process
+OPENAI_POOL_SIZE = int(os.getenv("ABC_OPENAI_POOL_SIZE", str(max(10, AI_MAX_CONCURRENCY))))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("ABC_OPENAI_TIMEOUT", "120"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("ABC_OPENAI_CONNECT_TIMEOUT", "10"))
+_openai_client = None
+_openai_client_settings = {}
+_openai_client_lock = threading.Lock()
+
+# The extraction prompt is kept in sections so documents classified locally only get the rules they need
+AI_PROMPT_ACCURACY_RULE = (
     "CRITICAL: Transfer data accurately from the source text. Do not modify opponent names, dates, or times unless specifically instructed. "
+)
+AI_PROMPT_TYPE_DETECTION = (
     "Analyze this text and determine if it contains roster data or schedule data. Return JSON with 'type' field ('roster' or 'schedule') and appropriate data structure. "
+)
+AI_PROMPT_ROSTER_RULES = (
     "\n\nFor ROSTERS: Return 'teams' array where each team has: {{sport, players, coaches}}. "
     "IMPORTANT: If a document contains both VARSITY and JV (Junior Varsity) teams, create SEPARATE team entries for each. "
     "For example: 'Varsity Volleyball' and 'JV Volleyball' should be two different teams in the array. "
@@ -32,6 +121,8 @@ AI_PROMPT_TEMPLATE = (
         "IGNORE these extraneous lines. Focus on extracting complete player rows that have: name, number, height, weight, position, and grade/year. "
         "Skip any lines that are clearly headers, footers, contact info, or administrative text. Only extract valid player entries. "
         "Coaches: {{title, name}}. "
+)
+AI_PROMPT_SCHEDULE_RULES = (
         "\n\nFor SCHEDULES: Return 'schedules' array where each schedule has: {{sport, games}}. "
     "Games: {{date, opponent (Level), and time}}. "
     "ACCURACY REQUIREMENT: Use the exact opponent names from the source text. Do not substitute or change opponent names. "
@@ -48,44 +139,503 @@ AI_PROMPT_TEMPLATE = (
     "If the pdf specifies the game is JV and Varsity, the InDesign document should show (JV/V). "
     "CRITICAL: Replace ALL instances of 'Varsity' with 'V' in the output. Never leave 'Varsity' unchanged. "
     "For home games, opponent names must be in ALL CAPITAL LETTERS."
+)
+AI_PROMPT_CLOSING = (
     "\n\nSport names should be descriptive if the information is provide in the pdf (e.g. 'Football', 'Varisity Boys Basketball', 'JV Girls Volleyball'). "
     "If multiple sports/teams, return separate entries for each.\n\n{}"
 )
+AI_PROMPT_TEMPLATE = (AI_PROMPT_ACCURACY_RULE + AI_PROMPT_TYPE_DETECTION
+                      + AI_PROMPT_ROSTER_RULES + AI_PROMPT_SCHEDULE_RULES + AI_PROMPT_CLOSING)
+AI_PROMPT_TYPE_HINTS = {
+    "roster": "This text contains ROSTER data. Return JSON with 'type' field 'roster' and a 'teams' array. ",
+    "schedule": "This text contains SCHEDULE data. Return JSON with 'type' field 'schedule' and a 'schedules' array. ",
+}
+AI_SYSTEM_PROMPT = "Extract structured roster data. Return valid JSON only."
+AI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+
+# Streamed replies are parsed as they arrive; a reply cut off at max_tokens (or malformed part way)
+# is continued with a follow-up request for the remaining teams instead of being thrown away
+AI_STREAMING = os.getenv("ABC_AI_STREAM", "on") != "off"
+AI_MAX_CONTINUATIONS = int(os.getenv("ABC_AI_MAX_CONTINUATIONS", "2"))
+AI_CONTINUATION_PROMPT = (
+    "Your reply was cut off or was not valid JSON. These are already complete: {}. "
+    "Return a new JSON object of the same shape (same 'type') containing ONLY the remaining teams or schedules. "
+    "Return valid JSON only."
+)
+
+# AI response cache - keyed by extracted text, prompt version and model so reruns cost no tokens
+# AI_CACHE_MODE: "on" (read + write), "refresh" (skip reads, overwrite entries) or "off"
+AI_PROMPT_VERSION = hashlib.sha256(
+    (AI_SYSTEM_PROMPT + AI_PROMPT_TEMPLATE + json.dumps(AI_PROMPT_TYPE_HINTS)).encode("utf-8")).hexdigest()[:12]
+AI_CACHE_DIR = Path(os.getenv("ABC_AI_CACHE_DIR", ".ai_cache"))
+AI_CACHE_MAX_MB = float(os.getenv("ABC_AI_CACHE_MAX_MB", "50"))
+AI_CACHE_MODE = os.getenv("ABC_AI_CACHE", "on")
+
+# Per-page text cache - pages are keyed by a hash of their content stream, so re-extracting
+# a packet with a few edited pages only redoes those pages
+PAGE_CACHE_DIR = Path(os.getenv("ABC_PAGE_CACHE_DIR", ".page_cache"))
+PAGE_CACHE_VERSION = "4"  # Bump when page extraction changes so stale text is not reused
+PAGE_CACHE_MAX_MB = float(os.getenv("ABC_PAGE_CACHE_MAX_MB", "200"))
+PAGE_WORKERS = int(os.getenv("ABC_PAGE_WORKERS", str(os.cpu_count() or 1)))
+PAGE_PARALLEL_MIN_PAGES = int(os.getenv("ABC_PAGE_PARALLEL_MIN_PAGES", "8"))
 
-def call_ai_agent(text):
-    """Extract roster or schedule data using OpenAI"""
-    prompt = AI_PROMPT_TEMPLATE.format(text)
+# Large documents are sent as several requests so no response hits max_tokens and gets truncated
+AI_CHUNK_CHARS = int(os.getenv("ABC_AI_CHUNK_CHARS", "4000"))
+SPORT_HEADING_PATTERN = re.compile(
+    r"^\W*(?=.{0,60}$).*\b(football|volleyball|basketball|baseball|softball|soccer|wrestling|track|"
+    r"cross country|golf|tennis|swimming|bowling|cheer\w*|dance|hockey|lacrosse|pom)\b",
+    re.IGNORECASE)
+
+# Prompt compaction - contact details, page numbers and repeated headers are stripped before the
+# AI call, and chunks are split further until the whole prompt fits the token budget
+AI_PROMPT_TOKEN_BUDGET = int(os.getenv("ABC_AI_PROMPT_TOKEN_BUDGET", "2500"))
+NOISE_TOKEN_PATTERNS = [
+    re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"),  # email addresses
+    re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE),  # web links
+    re.compile(r"\(?\b\d{3}\)?[-.\s]\d{3}[-.]\d{4}\b"),  # phone numbers
+    # Street addresses only next to a city/state/zip or an address label - "10 Jordan Lane 6'2" is a player
+    re.compile(r"\b\d+\s+(?:[A-Z][a-z]+\s+){1,3}(?:St|Street|Ave|Avenue|Rd|Road|Dr|Drive|Blvd|Ln|Lane|Ct|Hwy)\b\.?,?\s*"
+               r"(?=[A-Z][a-z]+(?: [A-Z][a-z]+)?,\s*[A-Z]{2}\s+\d{5}\b)"),
+    re.compile(r"(?i:\b(?:address|addr)\b\.?:?)\s*\d+\s+(?:[A-Z][a-z]+\s+){1,3}"
+               r"(?:St|Street|Ave|Avenue|Rd|Road|Dr|Drive|Blvd|Ln|Lane|Ct|Hwy)\b\.?"),
+    re.compile(r"\b[A-Z][a-z]+(?: [A-Z][a-z]+)?,\s*[A-Z]{2}\s+\d{5}(?:-\d{4})?\b"),  # city, state and zip
+]
+# "Page 3", "Page 3 of 4" or "3 of 4" - a bare number or "11/28" on its own line is data
+PAGE_NUMBER_PATTERN = re.compile(r"^(?:page\s*\d+(?:\s*(?:of|/)\s*\d+)?|\d+\s+of\s+\d+)$", re.IGNORECASE)
+# Lines this close to the top or bottom of a page are dropped when they repeat an earlier page's header/footer
+PAGE_EDGE_LINES = 2
+CONTACT_LABEL_WORDS = {"name", "email", "e-mail", "phone", "cell", "fax", "address", "contact", "info"}
+ROSTER_SIGNAL_PATTERN = re.compile(
+    r"\b(?:roster|player|pos|position|ht|wt|height|weight|grade|year|yr|fr|so|jr|sr|freshman|sophomore|senior|coach)\b"
+    r"|\d'\s?\d{1,2}|^\d{1,3}\s+[A-Z][a-z]+\s+[A-Z]",
+    re.IGNORECASE)
+SCHEDULE_SIGNAL_PATTERN = re.compile(
+    r"\b(?:schedule|vs|opponent|home|away|tourn\w*|invitational|jan|feb|mar|apr|jun|jul|aug|sept?|oct|nov|dec)\b"
+    r"|\b\d{1,2}:\d{2}|\b\d{1,2}/\d{1,2}\b|@",
+    re.IGNORECASE)
+
+# Local table parser - used instead of the AI when it is at least this confident.
+# Every rejected row is a player missing from the output, so the default is strict.
+LOCAL_PARSE_ENABLED = os.getenv("ABC_LOCAL_PARSE", "on") != "off"
+LOCAL_PARSE_MIN_CONFIDENCE = float(os.getenv("ABC_LOCAL_PARSE_MIN_CONFIDENCE", "0.98"))
+
+def new_file_metrics(file_name):
+    """Empty metrics record for one input file"""
+    return {"file": file_name, "stages": {}, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0,
+            "ai_calls": 0, "ai_cache_hits": 0, "page_cache_hits": 0, "retries": 0, "lock": threading.Lock()}
+
+@contextmanager
+def use_file_metrics(record):
+    """Send timings and counters recorded on this thread to record (e.g. from a chunk worker thread)"""
+    previous = getattr(_metrics_local, "record", None)
+    _metrics_local.record = record
+    try:
+        yield record
+    finally:
+        _metrics_local.record = previous
+
+def current_file_metrics():
+    return getattr(_metrics_local, "record", None)
+
+def add_stage_time(stage, seconds):
+    record = current_file_metrics()
+    if record is not None:
+        with record["lock"]:
+            record["stages"][stage] = record["stages"].get(stage, 0.0) + seconds
+
+@contextmanager
+def timed_stage(stage):
+    """Add the wall time of the block to the current file's stage total"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(stage, time.perf_counter() - started)
+
+def count_metric(name, amount=1):
+    """Add to one of the current file's counters (tokens, cost, cache hits, retries...)"""
+    record = current_file_metrics()
+    if record is not None:
+        with record["lock"]:
+            record[name] += amount
+
+def write_run_metrics(records, wall_seconds):
+    """Append per-file records as JSON lines under METRICS_DIR and print an end-of-run summary table"""
+    if not records:
+        return
+    rows = [{key: value for key, value in record.items() if key != "lock"} for record in records]
+    totals = {name: sum(row[name] for row in rows)
+              for name in ("prompt_tokens", "completion_tokens", "cost", "ai_calls", "ai_cache_hits", "page_cache_hits", "retries")}
     
-    print("🤖 Calling OpenAI API...")
-    client = openai.OpenAI(api_key=openai.api_key)
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "system", "content": "Extract structured roster data. Return valid JSON only."}, {"role": "user", "content": prompt}],
-        temperature=0.1, max_tokens=3000
-    )
-    
-    # Print usage and trace info
-    usage = response.usage
-    print(f"📊 API Usage - Tokens: {usage.prompt_tokens} prompt + {usage.completion_tokens} completion = {usage.total_tokens} total")
-    prompt_cost = usage.prompt_tokens * 0.0005 / 1000
-    completion_cost = usage.completion_tokens * 0.0015 / 1000
-    total_cost = prompt_cost + completion_cost
-    print(f"💰 Estimated Cost: ${total_cost:.4f} (${prompt_cost:.4f} prompt + ${completion_cost:.4f} completion)")
-    
-    if hasattr(response, 'id'):
-        print(f"🔗 Trace Link: https://platform.openai.com/playground?assistant={response.id}")
-        print(f"📋 Request ID: {response.id}")
+    METRICS_DIR.mkdir(parents=True, exist_ok=True)
+    path = METRICS_DIR / datetime.now().strftime("run_%Y%m%d_%H%M%S.jsonl")
+    with open(path, "a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+        f.write(json.dumps({"summary": dict(totals, files=len(rows), wall_seconds=round(wall_seconds, 3))}) + "\n")
+    
+    stages = [s for s in METRICS_STAGES if any(s in row["stages"] for row in rows)]
+    stages += sorted({s for row in rows for s in row["stages"]} - set(stages))
+    print(f"\n📈 Run summary: {len(rows)} file(s) in {wall_seconds:.2f}s")
+    print(f"   {'Stage':<16}{'Files':>6}{'Total s':>10}{'Mean s':>10}{'Max s':>10}")
+    for stage in stages:
+        times = [row["stages"][stage] for row in rows if stage in row["stages"]]
+        print(f"   {stage:<16}{len(times):>6}{sum(times):>10.3f}{sum(times) / len(times):>10.3f}{max(times):>10.3f}")
+    print(f"   Tokens: {totals['prompt_tokens']:,} prompt + {totals['completion_tokens']:,} completion"
+          f" | Cost: ${totals['cost']:.4f} | AI calls: {totals['ai_calls']} | AI cache hits: {totals['ai_cache_hits']}"
+          f" | Page cache hits: {totals['page_cache_hits']} | Retries: {totals['retries']}")
+    print(f"   Metrics written to {path}")
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before retrying a failed request (honours Retry-After when sent)"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return AI_BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, 1)
+
+def configure_openai_client(transport=None, base_url=None, pool_size=None, timeout=None, connect_timeout=None):
+    """Change how the shared OpenAI client is built; the next get_openai_client() call uses the new settings
+
+    transport: an httpx transport (e.g. httpx.MockTransport) to send requests somewhere other than the network
+    base_url: API root such as a local stub server (defaults to OPENAI_BASE_URL / api.openai.com)
+    """
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is not None:
+            _openai_client.close()
+            _openai_client = None
+        _openai_client_settings.clear()
+        _openai_client_settings.update(transport=transport, base_url=base_url, pool_size=pool_size,
+                                       timeout=timeout, connect_timeout=connect_timeout)
+
+def get_openai_client():
+    """Return the process-wide OpenAI client, creating it on first use"""
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            settings = _openai_client_settings
+            pool_size = settings.get("pool_size") or OPENAI_POOL_SIZE
+            http_client = httpx.Client(
+                transport=settings.get("transport"),
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(settings.get("timeout") or OPENAI_TIMEOUT_SECONDS,
+                                      connect=settings.get("connect_timeout") or OPENAI_CONNECT_TIMEOUT_SECONDS),
+                follow_redirects=True,
+            )
+            # Retries are handled by create_chat_completion so the backoff is shared across workers
+            _openai_client = openai.OpenAI(api_key=openai.api_key or os.getenv("OPENAI_API_KEY"), base_url=settings.get("base_url"),
+                                           max_retries=0, http_client=http_client)
+        return _openai_client
+
+def create_chat_completion(client, read=None, **kwargs):
+    """Send a chat completion request, backing off and retrying on rate limits and transient errors
+
+    read: optional function applied to the response while its request slot is still held
+    (used to consume a streamed reply; a connection dropped mid-stream is retried too)
+    """
+    for attempt in range(AI_MAX_RETRIES + 1):
+        try:
+            with _ai_slots:
+                response = client.chat.completions.create(**kwargs)
+                return read(response) if read else response
+        except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError, httpx.TransportError) as e:
+            # An exhausted quota will not recover by waiting
+            if attempt == AI_MAX_RETRIES or getattr(e, "code", None) == "insufficient_quota":
+                raise
+            delay = _retry_delay(e, attempt)
+            count_metric("retries")
+            print(f"⏳ {type(e).__name__} - retrying in {delay:.1f}s (attempt {attempt + 1}/{AI_MAX_RETRIES})")
+            time.sleep(delay)
+
+def ai_cache_key(text, doc_type=None, model=AI_MODEL):
+    """Content hash identifying one AI extraction request"""
+    digest = hashlib.sha256()
+    for part in (AI_PROMPT_VERSION, model, doc_type or "", text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def load_cached_response(key):
+    """Return the cached parsed AI response for key, or None on a miss"""
+    path = AI_CACHE_DIR / f"{key}.json"
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    _touch_cache_entry(path)
+    return data
+
+def _touch_cache_entry(path):
+    """Mark a cache entry as recently used so eviction keeps it"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def write_json_atomic(path, data):
+    """Write JSON via a temp file and rename so concurrent readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def store_cached_response(key, data):
+    """Save a parsed AI response and evict least recently used entries over the size cap"""
+    write_json_atomic(AI_CACHE_DIR / f"{key}.json", data)
+    prune_ai_cache()
+
+def prune_ai_cache(max_bytes=None):
+    """Delete least recently used AI cache entries until the cache fits in max_bytes"""
+    if max_bytes is None:
+        max_bytes = int(AI_CACHE_MAX_MB * 1024 * 1024)
+    prune_cache(AI_CACHE_DIR, max_bytes)
+
+def prune_cache(folder, max_bytes):
+    """Delete least recently used *.json entries under folder until it fits in max_bytes"""
+    entries = []
+    for path in Path(folder).rglob("*.json"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue  # Removed by another worker
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        total -= size
+
+def call_ai_agent(text, cache_mode=None, doc_type=None, on_item=None):
+    """Extract roster or schedule data using OpenAI, reusing cached results for identical text
+
+    cache_mode: "on", "refresh" or "off" (defaults to AI_CACHE_MODE)
+    doc_type: "roster" or "schedule" to send only that half of the instructions
+    on_item: called as on_item(key, item) for each valid team ("teams") or schedule ("schedules")
+             as soon as it has streamed in - not called for cache hits
+    """
+    cache_mode = cache_mode or AI_CACHE_MODE
+    key = ai_cache_key(text, doc_type)
+    if cache_mode == "on":
+        data = load_cached_response(key)
+        if data is not None:
+            print(f"⚡ AI cache hit ({key[:12]}) - skipped OpenAI call")
+            count_metric("ai_cache_hits")
+            return data
+    
+    data = _request_ai_extraction(text, doc_type, on_item)
+    # Only cache complete documents, never partial salvage from malformed or truncated JSON
+    if (cache_mode != "off" and isinstance(data, dict) and data.get("type") in ("roster", "schedule")
+            and not data.get("truncated")):
+        store_cached_response(key, data)
+    return data
+
+def ai_prompt_template(doc_type=None):
+    """The extraction prompt, trimmed to the roster or schedule rules when the type is already known"""
+    if doc_type == "roster":
+        return AI_PROMPT_ACCURACY_RULE + AI_PROMPT_TYPE_HINTS["roster"] + AI_PROMPT_ROSTER_RULES + AI_PROMPT_CLOSING
+    if doc_type == "schedule":
+        return AI_PROMPT_ACCURACY_RULE + AI_PROMPT_TYPE_HINTS["schedule"] + AI_PROMPT_SCHEDULE_RULES + AI_PROMPT_CLOSING
+    return AI_PROMPT_TEMPLATE
+
+def build_ai_request(text, doc_type=None):
+    """Chat completion parameters for extracting one document (or chunk)"""
+    prompt = ai_prompt_template(doc_type).format(text)
+    return {
+        "model": AI_MODEL,
+        "messages": [{"role": "system", "content": AI_SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+        "temperature": 0.1, "max_tokens": 3000,
+    }
+
+def _report_ai_usage(usage, response_id):
+    """Print token usage, cost and trace info for one reply and add them to the file's metrics"""
+    count_metric("ai_calls")
+    if usage is not None:
+        print(f"📊 API Usage - Tokens: {usage.prompt_tokens} prompt + {usage.completion_tokens} completion = {usage.total_tokens} total")
+        prompt_cost = usage.prompt_tokens * 0.0005 / 1000
+        completion_cost = usage.completion_tokens * 0.0015 / 1000
+        total_cost = prompt_cost + completion_cost
+        print(f"💰 Estimated Cost: ${total_cost:.4f} (${prompt_cost:.4f} prompt + ${completion_cost:.4f} completion)")
+        count_metric("prompt_tokens", usage.prompt_tokens)
+        count_metric("completion_tokens", usage.completion_tokens)
+        count_metric("cost", total_cost)
+    
+    if response_id:
+        print(f"🔗 Trace Link: https://platform.openai.com/playground?assistant={response_id}")
+        print(f"📋 Request ID: {response_id}")
     else:
         print("🔗 Trace Link: https://platform.openai.com/usage (check your OpenAI dashboard)")
+
+def _read_ai_stream(stream, on_item=None):
+    """Consume a streamed reply, validating each team/schedule as soon as its object closes"""
+    parser = JsonItemStream()
+    reply = {"id": None, "usage": None, "finish_reason": None, "items": []}
+    for chunk in stream:
+        reply["id"] = reply["id"] or chunk.id
+        reply["usage"] = chunk.usage or reply["usage"]
+        for choice in chunk.choices:
+            reply["finish_reason"] = choice.finish_reason or reply["finish_reason"]
+            for key, item in parser.feed(choice.delta.content or ""):
+                problem = validate_extracted_item(key, item)
+                if problem:
+                    print(f"⚠️  Streamed {key[:-1]} failed validation ({problem}) - left for the final parse")
+                    continue
+                reply["items"].append((key, item))
+                field = "players" if key == "teams" else "games"
+                print(f"📥 Received {item['sport']} ({len(item[field])} {field})")
+                if on_item is not None:
+                    on_item(key, item)
+    reply["content"] = parser.text
+    return reply
+
+def _streamed_result(items):
+    """Document built from the objects that streamed in completely"""
+    key = items[0][0] if items else "teams"
+    return {"type": "roster" if key == "teams" else "schedule", key: [item for k, item in items if k == key]}
+
+def _request_ai_extraction(text, doc_type=None, on_item=None):
+    """Send one extraction request to OpenAI and parse the JSON reply"""
+    print("🤖 Calling OpenAI API...")
+    request = build_ai_request(text, doc_type)
+    if not AI_STREAMING:
+        with timed_stage("ai_call"):
+            response = create_chat_completion(get_openai_client(), **request)
+        _report_ai_usage(response.usage, getattr(response, "id", None))
+        with timed_stage("json_repair"):
+            return parse_ai_json(response.choices[0].message.content)
+    
+    results = []
+    for continuation in range(AI_MAX_CONTINUATIONS + 1):
+        with timed_stage("ai_call"):
+            reply = create_chat_completion(get_openai_client(), read=lambda stream: _read_ai_stream(stream, on_item),
+                                           stream=True, stream_options={"include_usage": True}, **request)
+        _report_ai_usage(reply["usage"], reply["id"])
+        
+        problem = "cut off"
+        if reply["finish_reason"] != "length":
+            try:
+                with timed_stage("json_repair"):
+                    results.append(parse_ai_json(reply["content"]))
+                break
+            except json.JSONDecodeError:
+                if not reply["items"]:
+                    raise
+                # Keep every object that arrived intact and ask for the rest, as for a cut-off reply
+                print(f"⚠️  Using the {len(reply['items'])} team(s)/schedule(s) that streamed in intact")
+                problem = "malformed"
+        
+        results.append(_streamed_result(reply["items"]))
+        if continuation == AI_MAX_CONTINUATIONS:
+            print(f"❌ Reply still {problem} after {AI_MAX_CONTINUATIONS} follow-up request(s) - output is incomplete")
+            results[-1]["truncated"] = True
+            break
+        done = [item["sport"] for _, item in reply["items"]]
+        print(f"✂️  Reply {problem} after {len(done)} complete team(s)/schedule(s) - requesting the rest")
+        request = dict(request, messages=request["messages"] + [
+            {"role": "assistant", "content": reply["content"]},
+            {"role": "user", "content": AI_CONTINUATION_PROMPT.format(", ".join(done) or "none")},
+        ])
     
+    if len(results) == 1:
+        return results[0]
+    data = merge_chunk_results(results)
+    if results[-1].get("truncated"):
+        data["truncated"] = True
+    return data
+
+class JsonItemStream:
+    """Incremental scanner for the model's JSON reply
+
+    feed() returns each object of the top-level 'teams' or 'schedules' array as soon as its
+    closing brace arrives, so it can be validated and used before the reply is finished.
+    """
+    ITEM_KEYS = ("teams", "schedules")
+    
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string = None
+        self._array_key = None
+        self._item_start = None
+    
+    def feed(self, delta):
+        """Add more reply text; returns [(array key, object)] for objects completed by it"""
+        self.text += delta
+        text, found = self.text, []
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = text[self._string_start:i]
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif ch in "{[":
+                if ch == "[" and self._stack == ["{"]:
+                    self._array_key = self._last_string
+                elif ch == "{" and self._stack == ["{", "["] and self._array_key in self.ITEM_KEYS:
+                    self._item_start = i
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if ch == "}" and self._item_start is not None and self._stack == ["{", "["]:
+                    item = self._load(text[self._item_start:i + 1])
+                    self._item_start = None
+                    if item is not None:
+                        found.append((self._array_key, item))
+        self._pos = len(text)
+        return found
+    
+    @staticmethod
+    def _load(fragment):
+        try:
+            return json.loads(re.sub(r',(\s*[}\]])', r'\1', fragment))
+        except json.JSONDecodeError:
+            return None
+
+def validate_extracted_item(key, item):
+    """Return why a streamed team/schedule is unusable, or None when it can be rendered"""
+    if not isinstance(item, dict):
+        return "not an object"
+    if not str(item.get("sport") or "").strip():
+        return "no sport"
+    field = "players" if key == "teams" else "games"
+    entries = item.get(field)
+    if not isinstance(entries, list) or not entries:
+        return f"no {field}"
+    if not all(isinstance(entry, dict) for entry in entries):
+        return f"{field} are not all objects"
+    if key == "teams":
+        if not all(normalize_player_data(p).get("name") or normalize_player_data(p).get("number") for p in entries):
+            return "player without a name or number"
+    elif not all(game.get("date") or game.get("opponent") for game in entries):
+        return "game without a date or opponent"
+    return None
+
+def parse_ai_json(content):
+    """Parse the model's JSON reply, repairing trailing commas and truncation where possible"""
     try:
-        return json.loads(response.choices[0].message.content)
+        return json.loads(content)
     except json.JSONDecodeError as e:
         print(f"❌ JSON parsing error: {str(e)}")
-        print(f"Raw AI response: {response.choices[0].message.content[:500]}...")
-        
-        # Try to fix common JSON issues
-        content = response.choices[0].message.content
+        print(f"Raw AI response: {content[:500]}...")
         
         # Remove any trailing commas before closing braces/brackets
         content = re.sub(r',(\s*[}\]])', r'\1', content)
@@ -127,146 +677,934 @@ def get_field_display_name(field):
     """Get the abbreviated display name for a field"""
     return FIELD_DISPLAY_NAMES.get(field, field.title())
 
-def make_indesign_tagged_roster(players, coaches, fields):
-    """Generate InDesign tagged text format for rosters"""
-    result = ["<ASCII-MAC>\n"]
-    # Use abbreviated field names for headers
-    display_headers = [get_field_display_name(f) for f in fields]
-    result.append("<ParaStyle:Table Header>" + "\t".join(display_headers) + "\n")
+# The defaults reproduce the original output byte for byte
+DEFAULT_RENDER_PROFILE = {
+    "prologue": "<ASCII-MAC>",
+    "styles": {"header": "Table Header", "row": "Table Row", "coach_header": "Coach Header",
+               "coach_row": "Coach Row", "team_header": "Team Header"},
+    "coach_heading": "Coaches",
+    "abbreviations": FIELD_DISPLAY_NAMES,  # other fields are title-cased
+    "roster_columns": ["number", "name", "position", "height", "weight", "year"],
+    "schedule_columns": ["date", "opponent", "location", "time", "home_away"],
+    "schedule_headers": ["Date", "Opponent", "Time"],  # null = abbreviations of the columns present
+    # The column padded to its longest value + extra so the next column lines up, and the header padded with it
+    "schedule_padding": {"column": "opponent", "extra": 3, "header": "Time"},
+}
+
+class RenderProfile:
+    """An output profile compiled into the fixed strings every rendered line is built from"""
+    
+    def __init__(self, settings):
+        styles = settings["styles"]
+        self.settings = settings
+        self.prologue = settings["prologue"] + "\n"
+        self.header = f"<ParaStyle:{styles['header']}>"
+        self.row = f"<ParaStyle:{styles['row']}>"
+        self.coach_section = f"\n<ParaStyle:{styles['coach_header']}>{settings['coach_heading']}\n"
+        self.coach_row = f"<ParaStyle:{styles['coach_row']}>"
+        self.team_header = f"<ParaStyle:{styles['team_header']}>"
+        self.abbreviations = settings["abbreviations"]
+        self.roster_columns = settings["roster_columns"]
+        self.schedule_columns = settings["schedule_columns"]
+        self.schedule_headers = settings["schedule_headers"]
+        padding = settings.get("schedule_padding") or {}
+        self.pad_column, self.pad_extra, self.pad_header = padding.get("column"), padding.get("extra", 0), padding.get("header")
     
-    for p in players:
-        row = [str(p.get(f, "")) for f in fields]
-        result.append("<ParaStyle:Table Row>" + "\t".join(row) + "\n")
+    def header_name(self, field):
+        return self.abbreviations.get(field, field.title())
+    
+    def roster_lines(self, players, coaches, fields):
+        """Header, player and coach paragraphs for one team"""
+        lines = [self.header + "\t".join(self.header_name(f) for f in fields) + "\n"]
+        lines.extend(self.row + "\t".join(str(p.get(f, "")) for f in fields) + "\n" for p in players)
+        if coaches:
+            lines.append(self.coach_section)
+            for c in coaches:
+                title, name = c.get("title", ""), c.get("name", "")
+                if title or name:
+                    lines.append(f"{self.coach_row}{title} {name}\n")
+        return lines
+    
+    def schedule_lines(self, games, fields):
+        """Header and game paragraphs for one schedule - cells and the padded column's width come from one pass"""
+        pad_index = fields.index(self.pad_column) if self.pad_column in fields else None
+        rows, widest = [], 0
+        for game in games:
+            rows.append([str(game.get(f, "")) for f in fields])
+            if self.pad_column:
+                widest = max(widest, len(str(game.get(self.pad_column, ""))))
+        width = widest + self.pad_extra
+        
+        headers = self.schedule_headers or [self.header_name(f) for f in fields]
+        lines = [self.header + "\t".join(h.ljust(width) if h == self.pad_header else h for h in headers) + "\n"]
+        for cells in rows:
+            if pad_index is not None:
+                cells[pad_index] = cells[pad_index].ljust(width)
+            lines.append(self.row + "\t".join(cells) + "\n")
+        return lines
     
-    if coaches:
-        result.append("\n<ParaStyle:Coach Header>Coaches\n")
-        for c in coaches:
-            title, name = c.get("title", ""), c.get("name", "")
-            if title or name:
-                result.append(f"<ParaStyle:Coach Row>{title} {name}\n")
+    def document(self, lines):
+        return self.prologue + "".join(lines)
     
-    return ''.join(result)
+    def combined_document(self, sections):
+        """One file for several teams/schedules: [(sport, lines)] each under a team heading"""
+        return self.prologue + "".join(f"{self.team_header}{sport}\n" + "".join(lines) for sport, lines in sections)
+
+@lru_cache(maxsize=None)
+def load_render_profile(path=None):
+    """DEFAULT_RENDER_PROFILE with the overrides from a JSON profile file, compiled for rendering"""
+    settings = json.loads(json.dumps(DEFAULT_RENDER_PROFILE))
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for key, value in json.load(f).items():
+                if isinstance(value, dict) and isinstance(settings.get(key), dict):
+                    settings[key].update(value)
+                else:
+                    settings[key] = value
+    return RenderProfile(settings)
+
+def current_render_profile():
+    return load_render_profile(RENDER_PROFILE_PATH)
+
+def make_indesign_tagged_roster(players, coaches, fields):
+    """Generate InDesign tagged text format for rosters"""
+    profile = current_render_profile()
+    return profile.document(profile.roster_lines(players, coaches, fields))
 
 def make_indesign_tagged_schedule(games, fields):
     """Generate InDesign tagged text format for schedules with aligned columns"""
-    result = ["<ASCII-MAC>\n"]
-    
-    # Find the longest opponent name to determine tab spacing
-    max_opponent_length = 0
-    for game in games:
-        opponent = str(game.get("opponent", ""))
-        max_opponent_length = max(max_opponent_length, len(opponent))
-    
-    # Add some padding for better alignment
-    tab_width = max_opponent_length + 3
-    
-    # Header row with proper spacing - align Time header with times column
-    # The structure is: Date \t Opponent \t Time
-    # We need to pad the "Time" header to align with where times start
-    result.append("<ParaStyle:Table Header>Date\tOpponent\t" + "Time".ljust(tab_width) + "\n")
-    
-    # Game rows with aligned columns
-    for game in games:
-        row_parts = []
-        for field in fields:
-            value = str(game.get(field, ""))
-            if field == "opponent":
-                # Pad opponent name to align times
-                padded_opponent = value.ljust(tab_width)
-                row_parts.append(padded_opponent)
-            else:
-                row_parts.append(value)
-        
-        result.append("<ParaStyle:Table Row>" + "\t".join(row_parts) + "\n")
-    
-    return ''.join(result)
+    profile = current_render_profile()
+    return profile.document(profile.schedule_lines(games, fields))
 
+def write_outputs_atomic(output_folder, outputs):
+    """Write a document's [(filename, text)] to temp files, then rename them all into place together
 
-def extract_text_from_image(image_path):
-    """Extract text from an image file using OCR"""
-    if not HAS_IMAGE_SUPPORT:
-        print(f"❌ Image processing not available. Install pytesseract and Pillow:")
-        print(f"   pip3 install pytesseract Pillow")
-        print(f"   macOS: brew install tesseract")
-        return ""
-    
+    Like writing them one by one, a later entry with the same filename replaces an earlier one.
+    """
+    staged = []
+    with timed_stage("file_write"):
+        try:
+            for index, (filename, text) in enumerate(outputs):
+                path = Path(output_folder) / filename
+                staged.append((path.with_name(f".{filename}.{os.getpid()}.{threading.get_ident()}.{index}.tmp"), path))
+                with open(staged[-1][0], "w", encoding="utf-8") as f:
+                    f.write(text)
+        except BaseException:
+            for tmp_path, _ in staged:
+                tmp_path.unlink(missing_ok=True)
+            raise
+        for tmp_path, path in staged:
+            os.replace(tmp_path, path)
+    return [filename for filename, _ in outputs]
+
+def _otsu_threshold(gray):
+    """Grey level that best separates ink from paper (Otsu's method on the histogram)"""
+    histogram = gray.histogram()[:256]
+    total = sum(histogram)
+    sum_all = sum(level * count for level, count in enumerate(histogram))
+    weight_dark = sum_dark = 0
+    best_level, best_spread = 128, -1.0
+    for level, count in enumerate(histogram):
+        weight_dark += count
+        weight_light = total - weight_dark
+        if weight_dark == 0 or weight_light == 0:
+            continue
+        sum_dark += level * count
+        mean_dark = sum_dark / weight_dark
+        mean_light = (sum_all - sum_dark) / weight_light
+        spread = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+        if spread > best_spread:
+            best_level, best_spread = level, spread
+    return best_level
+
+def _skew_angle(gray, threshold):
+    """Rotation in degrees that levels the text lines: the angle whose row-by-row ink profile is sharpest"""
+    sample = gray.copy()
+    sample.thumbnail((800, 800))
+    # Ink white on black, so the corners a rotation exposes add no ink
+    ink = sample.point(lambda value: 0 if value > threshold else 255)
+    best_angle, best_score = 0.0, -1.0
+    steps = int(OCR_MAX_SKEW_DEGREES * 4)
+    # Smallest angles first, so a page with nothing to level is left as it is
+    for step in sorted(range(-steps, steps + 1), key=abs):
+        angle = step / 4
+        rotated = ink.rotate(angle, resample=Image.BILINEAR)
+        rows = list(rotated.resize((1, rotated.height), Image.BOX).getdata())
+        mean = sum(rows) / len(rows)
+        score = sum((row - mean) ** 2 for row in rows)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+def preprocess_for_ocr(image):
+    """Grayscale, downscale, deskew and binarize an image before OCR"""
+    image = ImageOps.exif_transpose(image)  # phone photos store their orientation in EXIF
+    if image.mode in ("RGBA", "LA", "P"):
+        # Transparent areas become paper rather than black
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, "white")
+        image = Image.alpha_composite(background, image)
+    gray = image.convert("L")
+    if max(gray.size) > OCR_MAX_SIDE:
+        gray.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.LANCZOS)
+    threshold = _otsu_threshold(gray)
+    angle = _skew_angle(gray, threshold)
+    if angle:
+        gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    return gray.point(lambda value: 255 if value > threshold else 0)
+
+def _ocr_cache_path(image_hash):
+    return OCR_CACHE_DIR / f"{hashlib.sha256((OCR_VERSION + image_hash).encode('utf-8')).hexdigest()}.json"
+
+def _run_ocr(image, image_hash):
+    """OCR a PIL image, reusing the cached text for an identical image"""
+    cache_path = _ocr_cache_path(image_hash)
+    cached = _load_json(cache_path)
+    if isinstance(cached, dict) and "text" in cached:
+        _touch_cache_entry(cache_path)
+        return cached["text"]
     try:
-        with Image.open(image_path) as image:
-            return pytesseract.image_to_string(image)
+        with timed_stage("ocr"):
+            text = pytesseract.image_to_string(preprocess_for_ocr(image))
     except pytesseract.TesseractNotFoundError:
         print(f"❌ Tesseract OCR not found. Please install it:")
         print(f"   macOS: brew install tesseract")
         print(f"   Linux: sudo apt-get install tesseract-ocr")
         print(f"   Windows: Download from https://github.com/UB-Mannheim/tesseract/wiki")
         return ""
+    write_json_atomic(cache_path, {"text": text})
+    prune_cache(OCR_CACHE_DIR, int(OCR_CACHE_MAX_MB * 1024 * 1024))
+    return text
+
+def _report_missing_image_support():
+    print(f"❌ Image processing not available. Install pytesseract and Pillow:")
+    print(f"   pip3 install pytesseract Pillow")
+    print(f"   macOS: brew install tesseract")
+
+def extract_text_from_image(image_path):
+    """Extract text from an image file using OCR"""
+    if not HAS_IMAGE_SUPPORT:
+        _report_missing_image_support()
+        return ""
+    
+    try:
+        with Image.open(image_path) as image:
+            return _run_ocr(image, file_sha256(image_path))
     except Exception as e:
         print(f"❌ Error extracting text from image: {str(e)}")
         return ""
 
-def process_single_file(file_path, output_folder):
-    """Process one PDF or image file and create InDesign output files for each team/schedule"""
+def ocr_pdf_page(page):
+    """OCR a scanned PDF page (one with images but no text layer)"""
+    image = page.to_image(resolution=OCR_PDF_RESOLUTION).original
+    digest = hashlib.sha256(f"{image.mode}{image.size}".encode("utf-8"))
+    digest.update(image.tobytes())
+    try:
+        return _run_ocr(image, digest.hexdigest())
+    except Exception as e:
+        print(f"❌ Error running OCR on page {page.page_number}: {str(e)}")
+        return ""
+
+def file_sha256(file_path):
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _page_digest(page):
+    """Hash of a page's raw content streams, images, fonts and size - changes whenever the page's text could"""
+    from pdfminer.pdftypes import resolve1, stream_value
+    digest = hashlib.sha256(PAGE_CACHE_VERSION.encode("utf-8"))
+    digest.update(repr(page.bbox).encode("utf-8"))
+    contents = page.page_obj.contents
+    for stream in contents if isinstance(contents, list) else [contents]:
+        stream = stream_value(stream)
+        digest.update(stream.get_rawdata() or stream.get_data())
+    # Scanned pages all draw "/Im0 Do" - the scan itself is what differs
+    for xobject in _page_xobjects(page).values():
+        digest.update(xobject.get_rawdata() or b"")
+    # The same "(Smith) Tj" decodes to different text under a different embedded font or ToUnicode map
+    _digest_pdf_object(digest, resolve1(page.page_obj.resources.get("Font")) or {}, set())
+    return digest.hexdigest()
+
+def _digest_pdf_object(digest, obj, seen):
+    """Feed a PDF object into digest, following references and including stream data (font files, ToUnicode)"""
+    from pdfminer.pdftypes import PDFObjRef, PDFStream
+    if isinstance(obj, PDFObjRef):
+        if obj.objid in seen:
+            return
+        seen.add(obj.objid)
+        obj = obj.resolve()
+    if isinstance(obj, PDFStream):
+        _digest_pdf_object(digest, obj.attrs, seen)
+        digest.update(obj.get_rawdata() or obj.get_data())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            digest.update(f"/{key}".encode("utf-8"))
+            _digest_pdf_object(digest, obj[key], seen)
+    elif isinstance(obj, list):
+        digest.update(b"[")
+        for item in obj:
+            _digest_pdf_object(digest, item, seen)
+        digest.update(b"]")
+    else:
+        digest.update(repr(obj).encode("utf-8"))
+
+def _page_xobjects(page):
+    """The page's XObject streams (images and forms) by name, without parsing the page layout"""
+    from pdfminer.pdftypes import resolve1, stream_value
+    xobjects = resolve1(page.page_obj.resources.get("XObject")) or {}
+    return {name: stream_value(xobject) for name, xobject in xobjects.items()} if isinstance(xobjects, dict) else {}
+
+def _is_scanned_page(page):
+    """True for pages that are only images - no fonts means no text layer to extract"""
+    from pdfminer.pdftypes import resolve1
+    resources = page.page_obj.resources
+    return bool(_page_xobjects(page)) and not resolve1(resources.get("Font"))
+
+def _load_json(path):
+    """Read a JSON cache file, treating a missing or corrupt file as absent"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def _cached_page(digest):
+    path = PAGE_CACHE_DIR / "pages" / f"{digest}.json"
+    entry = _load_json(path)
+    if isinstance(entry, dict) and "text" in entry:
+        _touch_cache_entry(path)
+        return entry
+    return None
+
+def _extract_page(page):
+    """Extract one page's text and tables, then release pdfplumber's per-page object cache
+
+    Pages with no text layer but with images (scans) are read with OCR instead. When that
+    yields nothing (no Pillow/pytesseract, no Tesseract, or an OCR error) the record is marked
+    "ocr_failed" so it is not cached and OCR is tried again on the next run.
+    """
+    text = page.extract_text() or ""
+    scanned = not text.strip() and bool(page.images)
+    if scanned and HAS_IMAGE_SUPPORT:
+        text = ocr_pdf_page(page)
+    record = {"text": text, "tables": page.extract_tables()}
+    if scanned and not text.strip():
+        record["ocr_failed"] = True
+    page.close()
+    return record
+
+def _extract_page_range(file_path, indexes):
+    """Worker process entry point: extract the given pages of one PDF"""
+    with pdfplumber.open(file_path) as pdf:
+        return [_extract_page(pdf.pages[i]) for i in indexes]
+
+def _iter_pages_in_parallel(file_path, indexes, page_workers):
+    """Yield page records for indexes in order, fanning contiguous page runs out across processes"""
+    run_length = max(1, -(-len(indexes) // (page_workers * 2)))
+    runs = [indexes[i:i + run_length] for i in range(0, len(indexes), run_length)]
+    with process_pool.ProcessPoolExecutor(max_workers=min(page_workers, len(runs))) as pool:
+        for records in pool.map(_extract_page_range, [file_path] * len(runs), runs):
+            yield from records
+
+def iter_pdf_pages(file_path, page_workers=1):
+    """Yield {"text", "tables"} for each PDF page in order, lazily
+
+    Unchanged files are served from the page cache without opening the PDF. Otherwise only
+    pages whose content changed are extracted, across processes when page_workers > 1.
+    """
+    manifest_path = PAGE_CACHE_DIR / "files" / f"{file_sha256(file_path)}.json"
+    digests = _load_json(manifest_path)
+    if isinstance(digests, list):
+        records = [_cached_page(d) for d in digests]
+        if all(record is not None for record in records):
+            count_metric("page_cache_hits", len(records))
+            yield from records
+            return
+    
+    started = time.perf_counter()
+    with pdfplumber.open(file_path) as pdf:
+        digests = [_page_digest(page) for page in pdf.pages]
+        add_stage_time("pdf_open", time.perf_counter() - started)
+        cached = {}
+        for index, digest in enumerate(digests):
+            record = _cached_page(digest)
+            if record is not None:
+                cached[index] = record
+        count_metric("page_cache_hits", len(cached))
+        missing = [i for i in range(len(digests)) if i not in cached]
+        
+        # OCR is slow enough that even a couple of scanned pages are worth spreading across cores
+        scanned = HAS_IMAGE_SUPPORT and sum(1 for i in missing if _is_scanned_page(pdf.pages[i])) > 1
+        if page_workers > 1 and (len(missing) >= PAGE_PARALLEL_MIN_PAGES or scanned):
+            extracted = _iter_pages_in_parallel(file_path, missing, page_workers)
+        else:
+            extracted = (_extract_page(pdf.pages[i]) for i in missing)
+        
+        for index, digest in enumerate(digests):
+            if index in cached:
+                yield cached[index]
+                continue
+            with timed_stage("text_extraction"):
+                record = next(extracted)
+            if not record.pop("ocr_failed", False):
+                write_json_atomic(PAGE_CACHE_DIR / "pages" / f"{digest}.json", record)
+            yield record
+    write_json_atomic(manifest_path, digests)
+    if missing:
+        prune_cache(PAGE_CACHE_DIR, int(PAGE_CACHE_MAX_MB * 1024 * 1024))
+
+def extract_pages(file_path, page_workers=1):
+    """Extract {"text", "tables"} for each page of a supported input file (safe to run in a worker process)"""
+    file_ext = Path(file_path).suffix.lower()
+    if file_ext == '.pdf':
+        return list(iter_pdf_pages(file_path, page_workers))
+    if file_ext in SUPPORTED_IMAGE_EXTS:
+        return [{"text": extract_text_from_image(file_path), "tables": []}]
+    return None
+
+def extract_pages_with_metrics(file_path):
+    """Process pool entry point: extract_pages plus the metrics it recorded, for the parent to merge"""
+    with use_file_metrics(new_file_metrics(Path(file_path).name)) as record:
+        pages = extract_pages(file_path)
+    return pages, {"stages": record["stages"], "page_cache_hits": record["page_cache_hits"]}
+
+def _split_at_headings(page_text, max_chars):
+    """Split an oversized page before each sport heading, then at line breaks if still too long"""
+    sections, current = [], []
+    for line in page_text.split("\n"):
+        if current and SPORT_HEADING_PATTERN.search(line):
+            sections.append("\n".join(current))
+            current = []
+        current.append(line)
+    sections.append("\n".join(current))
+    
+    pieces = []
+    for section in sections:
+        piece = []
+        for line in section.split("\n"):
+            if piece and len("\n".join(piece + [line])) > max_chars:
+                pieces.append("\n".join(piece))
+                piece = []
+            piece.append(line)
+        pieces.append("\n".join(piece))
+    return pieces
+
+def split_document(pages, max_chars=None):
+    """Group page text into chunks of at most max_chars, breaking only at page boundaries or sport headings
+
+    A chunk that starts mid-team is prefixed with the last heading seen so the team keeps its name.
+    """
+    max_chars = max_chars or AI_CHUNK_CHARS
+    units = []
+    for page_text in pages:
+        units.extend(_split_at_headings(page_text, max_chars) if len(page_text) > max_chars else [page_text])
+    
+    chunks, current, last_heading = [], [], None
+    for unit in units:
+        if current and len("\n".join(current + [unit])) > max_chars:
+            chunks.append("\n".join(current))
+            current = []
+        if not current and last_heading and not SPORT_HEADING_PATTERN.search(unit.lstrip().split("\n", 1)[0]):
+            current.append(f"(Previous section heading: {last_heading})")
+        current.append(unit)
+        for line in unit.split("\n"):
+            if SPORT_HEADING_PATTERN.search(line):
+                last_heading = line.strip()
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def _jersey_sort_key(player):
+    """Sort key placing players by jersey number, with unnumbered players last"""
+    number = str(normalize_player_data(player).get("number", ""))
+    match = re.match(r"\d+", number.strip())
+    return (0, int(match.group(0)), number) if match else (1, 0, number)
+
+def merge_chunk_results(results):
+    """Combine per-chunk AI results into one document, joining teams that were split across chunks"""
+    teams, schedules = {}, {}
+    for result in results:
+        for team in result.get("teams") or []:
+            if not isinstance(team, dict):
+                continue
+            key = str(team.get("sport", "unknown")).strip().lower()
+            if key not in teams:
+                teams[key] = dict(team, players=list(team.get("players") or []), coaches=list(team.get("coaches") or []))
+                continue
+            merged = teams[key]
+            for field in ("players", "coaches"):
+                for entry in team.get(field) or []:
+                    if entry not in merged[field]:
+                        merged[field].append(entry)
+            merged["players"].sort(key=_jersey_sort_key)
+        for schedule in result.get("schedules") or []:
+            if not isinstance(schedule, dict):
+                continue
+            key = str(schedule.get("sport", "unknown")).strip().lower()
+            if key not in schedules:
+                schedules[key] = dict(schedule, games=list(schedule.get("games") or []))
+                continue
+            for game in schedule.get("games") or []:
+                if game not in schedules[key]["games"]:
+                    schedules[key]["games"].append(game)
+    
+    # Most chunks agree on the type; ties go to whichever kind of data was actually found
+    types = [r.get("type") for r in results]
+    doc_type = max(("roster", "schedule"), key=lambda t: (types.count(t), bool(teams if t == "roster" else schedules)))
+    return {"type": doc_type, "teams": list(teams.values()), "schedules": list(schedules.values())}
+
+@lru_cache(maxsize=1)
+def _token_encoding():
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(AI_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text):
+    """Number of tokens text uses with the configured model (estimated when tiktoken is not installed)"""
+    if HAS_TIKTOKEN:
+        return len(_token_encoding().encode(text))
+    return (len(text) + 3) // 4
+
+def compact_page_text(text):
+    """Strip contact details, page numbers and label-only lines, and collapse whitespace"""
+    lines = []
+    for line in text.split("\n"):
+        for pattern in NOISE_TOKEN_PATTERNS:
+            line = pattern.sub(" ", line)
+        line = re.sub(r"\s+", " ", line).strip()
+        if not line or PAGE_NUMBER_PATTERN.match(line):
+            continue
+        if set(line.lower().split()) <= CONTACT_LABEL_WORDS:
+            continue  # e.g. a 'Name Email Phone' header left behind once the details are gone
+        lines.append(line)
+    return "\n".join(lines)
+
+def _drop_repeated_headers(pages):
+    """Drop page headers and footers - lines in the same spot at the top or bottom of every page (a cover page may differ)
+
+    The first copy is kept, so the document still starts with its header.
+    """
+    pages = [text.split("\n") for text in pages]
+    counts = {}
+    for lines in pages:
+        edges = {(i, line) for i, line in enumerate(lines[:PAGE_EDGE_LINES])}
+        edges |= {(i - len(lines), line) for i, line in enumerate(lines) if i >= len(lines) - PAGE_EDGE_LINES}
+        for edge in edges:
+            counts[edge] = counts.get(edge, 0) + 1
+    repeated = {edge for edge, count in counts.items() if count >= max(2, len(pages) - 1)}
+    
+    seen, compacted = set(), []
+    for lines in pages:
+        keep = []
+        for i, line in enumerate(lines):
+            if ((i, line) in repeated or (i - len(lines), line) in repeated) and line in seen:
+                continue
+            seen.add(line)
+            keep.append(line)
+        compacted.append("\n".join(keep))
+    return compacted
+
+def classify_text(text):
+    """Guess 'roster' or 'schedule' from keyword signals; None when the text is ambiguous"""
+    roster_lines = schedule_lines = 0
+    for line in text.split("\n"):
+        roster_lines += bool(ROSTER_SIGNAL_PATTERN.search(line))
+        schedule_lines += bool(SCHEDULE_SIGNAL_PATTERN.search(line))
+    if roster_lines >= 3 and roster_lines >= 3 * schedule_lines:
+        return "roster"
+    if schedule_lines >= 3 and schedule_lines >= 3 * roster_lines:
+        return "schedule"
+    return None
+
+def prepare_ai_chunks(page_texts):
+    """Compact, classify and chunk a document's text for the AI - returns [(chunk, doc_type), ...]
+
+    Chunks whose prompt would exceed AI_PROMPT_TOKEN_BUDGET are split further.
+    """
+    chunks = split_document(_drop_repeated_headers([compact_page_text(t) for t in page_texts]))
+    prepared = []
+    while chunks:
+        chunk = chunks.pop(0)
+        doc_type = classify_text(chunk)
+        template = ai_prompt_template(doc_type)
+        prompt_tokens = count_tokens(template.format(chunk))
+        text_budget = AI_PROMPT_TOKEN_BUDGET - count_tokens(template.format(""))
+        if prompt_tokens > AI_PROMPT_TOKEN_BUDGET and text_budget > 0:
+            pieces = split_document([chunk], max(200, int(len(chunk) * text_budget / prompt_tokens * 0.9)))
+            if len(pieces) > 1:
+                chunks[:0] = pieces
+                continue
+        prepared.append((chunk, doc_type))
+    
+    original = sum(count_tokens(AI_PROMPT_TEMPLATE.format(chunk)) for chunk in split_document(page_texts))
+    compacted = sum(count_tokens(ai_prompt_template(doc_type).format(chunk)) for chunk, doc_type in prepared)
+    types = sorted({doc_type or "full" for _, doc_type in prepared})
+    print(f"✂️  Prompt compaction: {original:,} → {compacted:,} tokens "
+          f"({(compacted - original) / max(original, 1):+.0%}, {'/'.join(types)} instructions)")
+    return prepared
+
+def extract_document_data(pages, on_item=None):
+    """Extract structured data from page text, one AI request per chunk for large documents
+
+    on_item is passed to call_ai_agent for single-request documents only - a team may
+    continue into the next chunk, so chunked documents are complete only once merged.
+    """
+    chunks = prepare_ai_chunks(pages)
+    if len(chunks) == 1:
+        return call_ai_agent(chunks[0][0], doc_type=chunks[0][1], on_item=on_item)
+    
+    print(f"✂️  Split document into {len(chunks)} chunks at page/team boundaries")
+    with _file_log() as log:
+        parent = log.current_buffer()
+        record = current_file_metrics()
+        
+        def run(index, chunk):
+            text, doc_type = chunk
+            with log.file_block(parent), use_file_metrics(record):
+                print(f"🧩 Chunk {index}/{len(chunks)}")
+                data = call_ai_agent(text, doc_type=doc_type)
+                if not isinstance(data, dict) or data.get("type") not in ("roster", "schedule"):
+                    # Failing the whole file keeps it in 'import' rather than silently dropping teams
+                    raise ValueError(f"chunk {index}/{len(chunks)} returned no usable data")
+                found = len(data.get("teams") or []) + len(data.get("schedules") or [])
+                print(f"🧩 Chunk {index}/{len(chunks)}: {found} team(s)/schedule(s)")
+                return data
+        
+        with ThreadPoolExecutor(max_workers=min(len(chunks), max(1, AI_MAX_CONCURRENCY))) as pool:
+            results = list(pool.map(run, range(1, len(chunks) + 1), chunks))
+    
+    data = merge_chunk_results(results)
+    print(f"🔗 Merged {len(chunks)} chunks into {len(data['teams'])} team(s) and {len(data['schedules'])} schedule(s)")
+    return data
+
+def process_extracted_text(pages, file_path, output_folder):
+    """Parse extracted pages and create InDesign output files for each team/schedule
+
+    Clean tabular rosters are parsed locally; everything else goes to the AI.
+    """
+    data = try_local_parse(pages)
+    if data is not None:
+        return render_document_data(data, file_path, output_folder)
+    
+    # Parse data with AI, writing each team's file as soon as it has streamed in
+    early = {}
+    def render_early(key, item):
+        # A retried request streams the same teams again - keep what the first attempt wrote
+        if early.get((key, str(item.get("sport")))) is not None:
+            return
+        render = process_roster_data if key == "teams" else process_schedule_data
+        created_files, success = render({key: [item]}, file_path, output_folder)
+        early[(key, str(item.get("sport")))] = created_files if success else None
+    
+    data = extract_document_data([page["text"] for page in pages], on_item=render_early)
+    
+    # Everything in the final document already written - just record it
+    if isinstance(data, dict) and data.get("type") in ("roster", "schedule"):
+        key = "teams" if data["type"] == "roster" else "schedules"
+        items = data.get(key) or []
+        wanted = [(key, str(item.get("sport"))) for item in items if isinstance(item, dict)]
+        if items and len(wanted) == len(items) == len(early) and all(early.get(w) is not None for w in wanted):
+            created_files = [f for w in wanted for f in early[w]]
+            # When every team was skipped as unchanged, the full render below reports that instead
+            if created_files:
+                if COMBINED_OUTPUT:
+                    created_files += write_combined_output(data, file_path, output_folder)
+                record_manifest_entry(file_path, data, output_folder, created_files)
+                print(f"📄 Created {len(created_files)} file(s) as the reply streamed in: {', '.join(created_files)}")
+                return created_files, True
+    created_files, success = render_document_data(data, file_path, output_folder)
+    # Keep the files of teams written as they streamed in that this render skipped
+    early_files = [f for files in early.values() if files for f in files if f not in created_files]
+    if success and early_files:
+        created_files = early_files + created_files
+        record_manifest_entry(file_path, data, output_folder, created_files)
+    return created_files, success
+
+def try_local_parse(pages):
+    """Return locally parsed roster data when it is confident enough to skip the AI, else None"""
+    if not LOCAL_PARSE_ENABLED:
+        return None
+    with timed_stage("local_parse"):
+        data, confidence = parse_roster_locally(pages)
+    if data and confidence >= LOCAL_PARSE_MIN_CONFIDENCE:
+        print(f"⚡ Parsed roster tables locally (confidence {confidence:.2f}) - skipped OpenAI call")
+        return data
+    if data:
+        print(f"🔎 Local parse confidence {confidence:.2f} is below {LOCAL_PARSE_MIN_CONFIDENCE:.2f} - using AI")
+    return None
+
+def render_document_data(data, file_path, output_folder, source_hash=None, skip_unchanged=None):
+    """Write InDesign files for extracted roster or schedule data and record them in the manifest
+
+    source_hash: sha256 of the source file when already known (rebuild), otherwise file_path is hashed
+    skip_unchanged: leave out teams identical to their stored version whose earlier output is still
+    in output_folder (default SKIP_UNCHANGED_TEAMS)
+    """
+    # Debug: Check data type
+    if not isinstance(data, dict):
+        print(f"⚠️  AI returned non-dict data: {type(data)} - {str(data)[:200]}")
+        return [], False
+    
+    doc_type = data.get("type", "unknown")
+    
+    if doc_type == "roster":
+        created_files, success = process_roster_data(data, file_path, output_folder, skip_unchanged)
+    elif doc_type == "schedule":
+        created_files, success = process_schedule_data(data, file_path, output_folder, skip_unchanged)
+    else:
+        print(f"⚠️  Unknown document type in {file_path}")
+        return [], False
+    if success:
+        record_manifest_entry(file_path, data, output_folder, created_files, source_hash)
+    return created_files, success
+
+def _report_unsupported_file(file_ext):
+    """Explain why a file type cannot be processed"""
+    print(f"⚠️  Unsupported file type: {file_ext}")
+    print(f"   Supported: PDF and images ({', '.join(sorted(SUPPORTED_IMAGE_EXTS))})")
+
+def process_single_file(file_path, output_folder, extracted=None):
+    """Process one PDF or image file and create InDesign output files for each team/schedule
+
+    extracted: optional future already running extract_pages_with_metrics(file_path), used by batch mode
+    """
     try:
         file_ext = Path(file_path).suffix.lower()
         
         # Extract text based on file type
         if file_ext == '.pdf':
             print(f"📄 Processing PDF: {file_path.name}")
-            with pdfplumber.open(file_path) as pdf:
-                text = "\n".join(page.extract_text() or "" for page in pdf.pages)
         elif file_ext in SUPPORTED_IMAGE_EXTS:
-            print(f"⚠️  Image files (PNG, JPG, etc.) are not directly supported.")
-            print(f"   Please convert the image to PDF first using:")
-            print(f"   - Preview (macOS): Open image → File → Export as PDF")
-            print(f"   - Online converter")
-            print(f"   Then process the PDF file.")
-            return [], False
+            print(f"🖼️  Processing image with OCR: {file_path.name}")
         else:
-            print(f"⚠️  Unsupported file type: {file_ext}")
-            return [], False
-        
-        # Parse data with AI
-        data = call_ai_agent(text)
-        
-        # Debug: Check data type
-        if not isinstance(data, dict):
-            print(f"⚠️  AI returned non-dict data: {type(data)} - {str(data)[:200]}")
+            _report_unsupported_file(file_ext)
             return [], False
-        
-        doc_type = data.get("type", "unknown")
-        
-        if doc_type == "roster":
-            return process_roster_data(data, file_path, output_folder)
-        elif doc_type == "schedule":
-            return process_schedule_data(data, file_path, output_folder)
+        if extracted is not None:
+            pages, extract_metrics = extracted.result()
+            for stage, seconds in extract_metrics["stages"].items():
+                add_stage_time(stage, seconds)
+            count_metric("page_cache_hits", extract_metrics["page_cache_hits"])
         else:
-            print(f"⚠️  Unknown document type in {file_path}")
+            pages = extract_pages(file_path, PAGE_WORKERS)
+        
+        if not any(page["text"].strip() for page in pages):
+            print(f"⚠️  No text could be extracted from {file_path.name}")
             return [], False
+        return process_extracted_text(pages, file_path, output_folder)
             
     except Exception as e:
         print(f"❌ Error processing {file_path}: {str(e)}")
         return [], False
 
+# Map common variations to standard keys
+PLAYER_KEY_MAPPING = {
+    'No.': 'number', 'no.': 'number', 'number': 'number',
+    'Name': 'name', 'name': 'name', 'player': 'name',
+    'Pos.': 'position', 'pos.': 'position', 'position': 'position',
+    'Ht.': 'height', 'ht.': 'height', 'height': 'height',
+    'Wt.': 'weight', 'wt.': 'weight', 'weight': 'weight',
+    'Yr.': 'year', 'yr.': 'year', 'year': 'year', 'grade': 'year'
+}
+
 def normalize_player_data(player):
     """Normalize player data keys to lowercase standard format"""
-    # Map common variations to standard keys
-    key_mapping = {
-        'No.': 'number', 'no.': 'number', 'number': 'number',
-        'Name': 'name', 'name': 'name', 'player': 'name',
-        'Pos.': 'position', 'pos.': 'position', 'position': 'position',
-        'Ht.': 'height', 'ht.': 'height', 'height': 'height',
-        'Wt.': 'weight', 'wt.': 'weight', 'weight': 'weight',
-        'Yr.': 'year', 'yr.': 'year', 'year': 'year', 'grade': 'year'
-    }
-    
     normalized = {}
     for key, value in player.items():
         # Convert key to standard lowercase
-        standard_key = key_mapping.get(key, key.lower())
+        standard_key = PLAYER_KEY_MAPPING.get(key, key.lower())
         normalized[standard_key] = value
     return normalized
 
-def process_roster_data(data, pdf_path, output_folder):
-    """Process roster data and create InDesign files"""
+# Table header cells (lowercased, without punctuation or parentheticals) that map onto player fields
+TABLE_HEADER_FIELDS = {key.lower().rstrip('.'): field for key, field in PLAYER_KEY_MAPPING.items()}
+TABLE_HEADER_FIELDS.update({name.lower().rstrip('.'): field for field, name in FIELD_DISPLAY_NAMES.items()})
+TABLE_HEADER_FIELDS.update({'#': 'number', 'num': 'number', 'jersey': 'number', 'pos': 'position',
+                            'gr': 'year', 'class': 'year', 'cl': 'year'})
+
+GRADE_WORDS = {
+    'f': '09', 'fr': '09', 'fresh': '09', 'freshman': '09',
+    'so': '10', 'soph': '10', 'sophomore': '10',
+    'jr': '11', 'junior': '11',
+    'sr': '12', 'senior': '12'
+}
+TEAM_LEVEL_PATTERN = re.compile(r"\b(junior varsity|varsity|jv|freshman|sophomore|boys|girls)\b", re.IGNORECASE)
+COACH_LINE_PATTERNS = [
+    # "Head Coach: Jane Smith"
+    re.compile(r"^\s*((?:head |assistant |asst\.? |varsity |jv |freshman )*coach)\s*[:\-–]\s*(.+?)\s*$", re.IGNORECASE),
+    # "Jane Smith - Varsity Coach"
+    re.compile(r"^\s*(?P<name>[A-Z][\w.' ]+?)\s*[-–]\s*(?P<title>(?:head |assistant |asst\.? |varsity |jv |freshman )*coach)\s*$", re.IGNORECASE),
+]
+
+def normalize_grade(value):
+    """Convert a grade/class value to two digits ('Fr', '9', '9th' -> '09'); None if unrecognised"""
+    clean = re.sub(r"[^a-z0-9]", "", str(value).lower())
+    if clean in GRADE_WORDS:
+        return GRADE_WORDS[clean]
+    match = re.fullmatch(r"(\d{1,2})(?:st|nd|rd|th)?", clean)
+    if match and 6 <= int(match.group(1)) <= 12:
+        return f"{int(match.group(1)):02d}"
+    return None
+
+def normalize_jersey(value):
+    """Use the first number when a player has two (e.g. '45/80' -> '45')"""
+    return re.split(r"\s*/\s*", str(value).strip())[0]
+
+def _table_header_field(cell):
+    clean = re.sub(r"\(.*?\)", "", str(cell or "")).strip().lower().rstrip('.:')
+    return TABLE_HEADER_FIELDS.get(clean)
+
+def _sport_name(title_lines):
+    """Build a team name like 'JV Volleyball' from table titles and page headings"""
+    sport, levels = None, []
+    for line in title_lines:
+        match = SPORT_HEADING_PATTERN.search(line)
+        if match and sport is None:
+            sport = match.group(1).title()
+        for level in TEAM_LEVEL_PATTERN.findall(line):
+            level = "JV" if level.lower() in ("jv", "junior varsity") else level.title()
+            if level not in levels:
+                levels.append(level)
+    return " ".join(levels + [sport]) if sport else None
+
+def _parse_roster_table(table):
+    """Turn one pdfplumber table into (title lines, players, row score) or None if it is not a roster"""
+    for header_index, row in enumerate(table):
+        columns = {}
+        for col, cell in enumerate(row):
+            field = _table_header_field(cell)
+            if field in columns:
+                return None  # Side-by-side rosters need the AI to tell the teams apart
+            if field:
+                columns[field] = col
+        if "name" in columns and len(columns) >= 2:
+            break
+    else:
+        return None
+    
+    titles = [" ".join(str(c) for c in row if c) for row in table[:header_index]]
+    # Text in an unlabelled column between roster columns means cells were split apart
+    stray_columns = [c for c in range(min(columns.values()), max(columns.values())) if c not in columns.values()]
+    players, checked, valid = [], 0, 0
+    for row in table[header_index + 1:]:
+        player = {field: re.sub(r"\s+", " ", str(row[col] or "")).strip() for field, col in columns.items() if col < len(row)}
+        if not any(player.values()) or _table_header_field(player.get("name")) == "name":
+            continue  # Blank or repeated header row
+        checked += 1
+        ok = bool(re.search(r"[A-Za-z]", player.get("name", "")))
+        ok = ok and not any(c < len(row) and str(row[c] or "").strip() for c in stray_columns)
+        if "number" in player:
+            ok = ok and bool(re.fullmatch(r"\d{1,3}(\s*/\s*\d{1,3})?", player["number"]))
+            player["number"] = normalize_jersey(player["number"])
+        if "year" in player:
+            grade = normalize_grade(player["year"])
+            ok = ok and grade is not None
+            player["year"] = grade or player["year"]
+        if player.get("weight"):
+            ok = ok and player["weight"].isdigit()
+        if ok:
+            valid += 1
+            players.append(player)
+    if not checked:
+        return None
+    return titles, players, valid / checked
+
+def _parse_coaches(text):
+    coaches = []
+    for line in text.split("\n"):
+        for pattern in COACH_LINE_PATTERNS:
+            match = pattern.match(line)
+            if match:
+                groups = match.groupdict() or {"title": match.group(1), "name": match.group(2)}
+                coaches.append({"title": groups["title"].strip().title(), "name": groups["name"].strip()})
+                break
+    return coaches
+
+def parse_roster_locally(pages):
+    """Parse clean tabular rosters without the AI
+
+    Returns (data, confidence) where data matches call_ai_agent's roster format, or (None, 0.0)
+    when no roster tables were found. Confidence is the share of table rows that parsed cleanly,
+    reduced when a team name cannot be found or a page has roster-like text outside any table.
+    """
+    teams, scores = [], []
+    for page in pages:
+        headings = [line for line in page["text"].split("\n") if SPORT_HEADING_PATTERN.search(line)][:1]
+        page_teams = []
+        for table in page.get("tables") or []:
+            parsed = _parse_roster_table(table)
+            if parsed is None:
+                continue
+            titles, players, score = parsed
+            page_teams.append({"sport": _sport_name(titles + headings), "players": players, "coaches": []})
+            scores.append(score)
+        if page_teams:
+            page_teams[0]["coaches"] = _parse_coaches(page["text"])
+        elif len(re.findall(r"(?m)^\s*\d{1,3}\s+[A-Z][a-z]+", page["text"])) >= 3:
+            scores.append(0.0)  # Player rows that no table captured - let the AI read this page
+        teams.extend(page_teams)
+    
+    if not teams:
+        return None, 0.0
+    confidence = min(scores)
+    names = [team["sport"] for team in teams]
+    if None in names or len(set(names)) != len(names):
+        confidence *= 0.5  # Output files are named by sport, so every team needs a distinct one
+    for team in teams:
+        team["sport"] = team["sport"] or "Roster"
+        team["players"].sort(key=_jersey_sort_key)
+    return {"type": "roster", "teams": teams}, confidence
+
+def roster_team_lines(profile, players, coaches):
+    """Normalize a team's players and render its lines - returns (players, lines)"""
+    with timed_stage("normalization"):
+        players = [normalize_player_data(p) for p in players]
+    
+    # AI already sorted players by jersey number
+    fields_present = [f for f in profile.roster_columns if any(p.get(f) for p in players)] or ["name"]
+    return players, profile.roster_lines(players, coaches, fields_present)
+
+def schedule_team_lines(profile, games):
+    """Render a schedule's lines"""
+    # AI already sorted games by date
+    fields_present = [f for f in profile.schedule_columns if any(g.get(f) for g in games)] or profile.schedule_columns[:2]
+    return profile.schedule_lines(games, fields_present)
+
+def combined_output_file(profile, pdf_path, kind, sections):
+    """(filename, text) of the file holding every team of a multi-team document (COMBINED_OUTPUT)"""
+    date_str = datetime.now().strftime("%m_%d_%Y")
+    return f"{Path(pdf_path).stem}_all_{kind}s_{date_str}.txt", profile.combined_document(sections)
+
+def write_combined_output(data, pdf_path, output_folder):
+    """Write the combined file for a document whose teams were rendered one at a time as they streamed in"""
+    profile = current_render_profile()
+    if data.get("type") == "roster":
+        kind = "roster"
+        sections = [(team.get("sport", "unknown"), roster_team_lines(profile, team["players"], team.get("coaches", []))[1])
+                    for team in data.get("teams", []) if team.get("players")]
+    else:
+        kind = "schedule"
+        sections = [(schedule.get("sport", "unknown"), schedule_team_lines(profile, schedule["games"]))
+                    for schedule in data.get("schedules", []) if schedule.get("games")]
+    if len(sections) < 2:
+        return []
+    created_files = write_outputs_atomic(output_folder, [combined_output_file(profile, pdf_path, kind, sections)])
+    print(f"✅ Exported combined {kind} to {created_files[0]}")
+    return created_files
+
+def process_roster_data(data, pdf_path, output_folder, skip_unchanged=None):
+    """Process roster data and create InDesign files
+
+    skip_unchanged: leave out teams identical to their stored version whose earlier output is still
+    in output_folder (default SKIP_UNCHANGED_TEAMS)
+    """
+    if skip_unchanged is None:
+        skip_unchanged = SKIP_UNCHANGED_TEAMS
     teams = data.get("teams", [])
     
     print(f"🔍 Debug: Found {len(teams)} team(s) in AI response")
@@ -282,9 +1620,10 @@ def process_roster_data(data, pdf_path, output_folder):
         print(f"⚠️  No teams found in {pdf_path}")
         return [], False
     
+    profile = current_render_profile()
     date_str = datetime.now().strftime("%m_%d_%Y")
     pdf_stem = Path(pdf_path).stem
-    created_files = []
+    outputs, labels, sections, checked_teams = [], [], [], []
     
     for team in teams:
         sport = team.get("sport", "unknown").lower().replace(" ", "_")
@@ -296,40 +1635,57 @@ def process_roster_data(data, pdf_path, output_folder):
             continue
         
         # Normalize player data keys
-        players = [normalize_player_data(p) for p in players]
-        
-        # AI already sorted players by jersey number
-        all_fields = ["number", "name", "position", "height", "weight", "year"]
-        fields_present = [f for f in all_fields if any(p.get(f) for p in players)] or ["name"]
-        tagged = make_indesign_tagged_roster(players, coaches, fields_present)
-        
-        output_filename = f"{pdf_stem}_{sport}_roster_{date_str}.txt"
-        output_path = output_folder / output_filename
-        
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(tagged)
+        players, lines = roster_team_lines(profile, players, coaches)
+        sections.append((team.get("sport", "unknown"), lines))
         
-        print(f"✅ Exported {sport} roster to {output_filename}")
-        created_files.append(output_filename)
+        checked = store_team_version("roster", pdf_path, team.get("sport", "unknown"), {"players": players, "coaches": coaches})
+        skipped = skip_unchanged and earlier_output_exists(checked, output_folder)
+        report_team_status(team.get("sport", "unknown"), checked, skipped)
+        checked_teams.append(checked)
+        if skipped:
+            continue
+        outputs.append((f"{pdf_stem}_{sport}_roster_{date_str}.txt", profile.document(lines)))
+        labels.append(team.get("sport", "unknown"))
+    
+    if COMBINED_OUTPUT and outputs and len(sections) > 1:
+        outputs.append(combined_output_file(profile, pdf_path, "roster", sections))
+        labels.append("combined")
+    try:
+        created_files = write_outputs_atomic(output_folder, outputs)
+    except Exception:
+        discard_team_versions(checked_teams)
+        raise
+    for label, output_filename in zip(labels, created_files):
+        print(f"✅ Exported {label.lower().replace(' ', '_')} roster to {output_filename}")
     
     if created_files:
         print(f"📄 Created {len(created_files)} roster file(s): {', '.join(created_files)}")
         return created_files, True
+    elif checked_teams:
+        print(f"📄 No roster changes in {pdf_path} - nothing to re-layout (--render-all writes them anyway)")
+        return [], True
     else:
         print(f"⚠️  No valid rosters found in {pdf_path}")
         return [], False
 
-def process_schedule_data(data, pdf_path, output_folder):
-    """Process schedule data and create InDesign files"""
+def process_schedule_data(data, pdf_path, output_folder, skip_unchanged=None):
+    """Process schedule data and create InDesign files
+
+    skip_unchanged: leave out schedules identical to their stored version whose earlier output is still
+    in output_folder (default SKIP_UNCHANGED_TEAMS)
+    """
+    if skip_unchanged is None:
+        skip_unchanged = SKIP_UNCHANGED_TEAMS
     schedules = data.get("schedules", [])
     
     if not schedules:
         print(f"⚠️  No schedules found in {pdf_path}")
         return [], False
     
+    profile = current_render_profile()
     date_str = datetime.now().strftime("%m_%d_%Y")
     pdf_stem = Path(pdf_path).stem
-    created_files = []
+    outputs, labels, sections, checked_teams = [], [], [], []
     
     for schedule in schedules:
         sport = schedule.get("sport", "unknown").lower().replace(" ", "_")
@@ -339,28 +1695,176 @@ def process_schedule_data(data, pdf_path, output_folder):
             print(f"⚠️  No games found for {sport} schedule")
             continue
         
-        # AI already sorted games by date
-        all_fields = ["date", "opponent", "location", "time", "home_away"]
-        fields_present = [f for f in all_fields if any(g.get(f) for g in games)] or ["date", "opponent"]
-        tagged = make_indesign_tagged_schedule(games, fields_present)
-        
-        output_filename = f"{pdf_stem}_{sport}_schedule_{date_str}.txt"
-        output_path = output_folder / output_filename
+        lines = schedule_team_lines(profile, games)
+        sections.append((schedule.get("sport", "unknown"), lines))
         
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(tagged)
-        
-        print(f"✅ Exported {sport} schedule to {output_filename}")
-        created_files.append(output_filename)
+        checked = store_team_version("schedule", pdf_path, schedule.get("sport", "unknown"), {"games": games})
+        skipped = skip_unchanged and earlier_output_exists(checked, output_folder)
+        report_team_status(schedule.get("sport", "unknown"), checked, skipped)
+        checked_teams.append(checked)
+        if skipped:
+            continue
+        outputs.append((f"{pdf_stem}_{sport}_schedule_{date_str}.txt", profile.document(lines)))
+        labels.append(schedule.get("sport", "unknown"))
+    
+    if COMBINED_OUTPUT and outputs and len(sections) > 1:
+        outputs.append(combined_output_file(profile, pdf_path, "schedule", sections))
+        labels.append("combined")
+    try:
+        created_files = write_outputs_atomic(output_folder, outputs)
+    except Exception:
+        discard_team_versions(checked_teams)
+        raise
+    for label, output_filename in zip(labels, created_files):
+        print(f"✅ Exported {label.lower().replace(' ', '_')} schedule to {output_filename}")
     
     if created_files:
         print(f"📄 Created {len(created_files)} schedule file(s): {', '.join(created_files)}")
         return created_files, True
+    elif checked_teams:
+        print(f"📄 No schedule changes in {pdf_path} - nothing to re-layout (--render-all writes them anyway)")
+        return [], True
     else:
         print(f"⚠️  No valid schedules found in {pdf_path}")
         return [], False
 
-def process_pdfs(files=None, output_folder="in_design_output"):
+class _FileLogStdout:
+    """stdout wrapper that holds each worker thread's prints until its file is finished"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is not None:
+            buffer.append(text)
+            return len(text)
+        with self.lock:
+            return self.stream.write(text)
+
+    def flush(self):
+        if getattr(self.local, "buffer", None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def current_buffer(self):
+        """The calling thread's open block, for helper threads to nest their output into"""
+        return getattr(self.local, "buffer", None)
+
+    @contextmanager
+    def file_block(self, parent=None):
+        """Print everything written inside the block as one uninterrupted chunk
+
+        parent: another thread's block to append to instead of printing directly
+        """
+        self.local.buffer = []
+        try:
+            yield
+        finally:
+            text, self.local.buffer = "".join(self.local.buffer), None
+            if parent is not None:
+                parent.append(text)
+            else:
+                with self.lock:
+                    self.stream.write(text)
+                    self.stream.flush()
+
+@contextmanager
+def _file_log():
+    """Yield the _FileLogStdout in use, installing one for the duration if needed"""
+    if isinstance(sys.stdout, _FileLogStdout):
+        yield sys.stdout
+        return
+    original_stdout = sys.stdout
+    sys.stdout = log = _FileLogStdout(original_stdout)
+    try:
+        yield log
+    finally:
+        sys.stdout = original_stdout
+
+def _process_files_concurrently(files, output_folder, jobs):
+    """Yield (file, created_files, success, metrics) as files finish, extracting text on a process pool
+    and running the AI calls on a thread pool"""
+    with _file_log() as log:
+        def run(file, extracted):
+            with log.file_block(), use_file_metrics(new_file_metrics(file.name)) as record:
+                print(f"\n📄 Processing: {file.name}")
+                started = time.perf_counter()
+                created_files, success = process_single_file(file, output_folder, extracted)
+                record["total_seconds"] = time.perf_counter() - started
+                return created_files, success, record
+        
+        with process_pool.ProcessPoolExecutor(max_workers=min(jobs, os.cpu_count() or 1)) as extract_pool, \
+                ThreadPoolExecutor(max_workers=jobs) as ai_pool:
+            futures = {}
+            for file in files:
+                readable = file.suffix.lower() == '.pdf' or file.suffix.lower() in SUPPORTED_IMAGE_EXTS
+                extracted = extract_pool.submit(extract_pages_with_metrics, file) if readable else None
+                futures[ai_pool.submit(run, file, extracted)] = file
+            for future in as_completed(futures):
+                yield (futures[future], *future.result())
+
+def _process_files_sequentially(files, output_folder):
+    """Yield (file, created_files, success, metrics) for each file, one at a time
+
+    Images are OCRed ahead on a process pool meanwhile - OCR is CPU-bound and each image is independent.
+    """
+    images = [f for f in files if f.suffix.lower() in SUPPORTED_IMAGE_EXTS]
+    ocr_pool = process_pool.ProcessPoolExecutor(max_workers=min(OCR_WORKERS, len(images))) if HAS_IMAGE_SUPPORT and len(images) > 1 else None
+    prefetched = {f: ocr_pool.submit(extract_pages_with_metrics, f) for f in images} if ocr_pool else {}
+    try:
+        for file in files:
+            print(f"\n📄 Processing: {file.name}")
+            with use_file_metrics(new_file_metrics(file.name)) as record:
+                started = time.perf_counter()
+                created_files, success = process_single_file(file, output_folder, prefetched.get(file))
+                record["total_seconds"] = time.perf_counter() - started
+            yield file, created_files, success, record
+    finally:
+        if ocr_pool is not None:
+            ocr_pool.shutdown(cancel_futures=True)
+
+def list_import_files(import_dir=Path("import")):
+    """PDF and supported image files waiting in the import folder"""
+    pdf_files = list(import_dir.glob("*.pdf"))
+    image_files = [f for f in import_dir.iterdir() 
+                  if f.is_file() and f.suffix.lower() in SUPPORTED_IMAGE_EXTS]
+    return pdf_files + image_files
+
+def process_files(files, output_folder, jobs=1):
+    """Process files and move each success to 'complete' - returns (processed_count, created_files)"""
+    processed_count = 0
+    all_created_files = []
+    
+    if jobs > 1 and len(files) > 1:
+        print(f"⚡ Concurrent mode: {jobs} files at a time, up to {AI_MAX_CONCURRENCY} AI requests in flight")
+        results = _process_files_concurrently(files, Path(output_folder), jobs)
+    else:
+        results = _process_files_sequentially(files, Path(output_folder))
+    
+    # Moves and counts happen here on the main thread, in the order files finish
+    run_started = time.perf_counter()
+    run_metrics = []
+    for file, created_files, success, record in results:
+        record["success"], record["outputs"] = success, len(created_files)
+        run_metrics.append(record)
+        if success:
+            all_created_files.extend(created_files)
+            # Move to complete folder after successful processing
+            shutil.move(str(file), str(Path("complete") / file.name))
+            print(f"📁 Moved {file.name} to 'complete' folder")
+            processed_count += 1
+        else:
+            print(f"⚠️  Skipped {file.name} due to processing error")
+    write_run_metrics(run_metrics, time.perf_counter() - run_started)
+    compact_manifest()
+    return processed_count, all_created_files
+
+def process_pdfs(files=None, output_folder="in_design_output", jobs=BATCH_JOBS):
     """Process PDF and image files - batch mode if no files specified, single file mode if files provided"""
     folders = [Path("import"), Path("complete"), Path(output_folder)]
     for folder in folders:
@@ -368,11 +1872,12 @@ def process_pdfs(files=None, output_folder="in_design_output"):
     
     # If no files specified, process all PDFs and images in import folder
     if files is None:
-        import_dir = Path("import")
-        pdf_files = list(import_dir.glob("*.pdf"))
-        image_files = [f for f in import_dir.iterdir() 
-                      if f.is_file() and f.suffix.lower() in SUPPORTED_IMAGE_EXTS]
-        files = pdf_files + image_files
+        files = list_import_files()
+        held = files_in_open_batch_jobs()
+        waiting = [f for f in files if f.name in held]
+        if waiting:
+            files = [f for f in files if f.name not in held]
+            print(f"⏳ {len(waiting)} file(s) are waiting on a batch job - run 'python main.py batch-collect'")
         
         if not files:
             print("📁 No PDF or image files found in the 'import' folder.")
@@ -385,21 +1890,7 @@ def process_pdfs(files=None, output_folder="in_design_output"):
             return False
         print(f"🔄 Processing single file: {files[0]}")
     
-    processed_count = 0
-    all_created_files = []
-    
-    for file in files:
-        print(f"\n📄 Processing: {file.name}")
-        
-        created_files, success = process_single_file(file, Path(output_folder))
-        if success:
-            all_created_files.extend(created_files)
-            # Move to complete folder after successful processing
-            shutil.move(str(file), str(Path("complete") / file.name))
-            print(f"📁 Moved {file.name} to 'complete' folder")
-            processed_count += 1
-        else:
-            print(f"⚠️  Skipped {file.name} due to processing error")
+    processed_count, all_created_files = process_files(files, output_folder, jobs)
     
     print(f"\n🎉 Processing complete! {processed_count}/{len(files)} files processed successfully.")
     if files is None or len(files) > 1:
@@ -413,24 +1904,713 @@ def process_pdfs(files=None, output_folder="in_design_output"):
     
     return len(all_created_files)
 
+def watch_import_folder(output_folder="in_design_output", jobs=BATCH_JOBS):
+    """Run as a daemon: process files dropped into 'import' as soon as they finish copying
+
+    A file is picked up once its size and modification time have not changed for
+    WATCH_SETTLE_SECONDS, so partially copied files are left alone. Files that fail stay in
+    'import' and are only retried after they change. Files waiting on a Batch API job are left
+    for 'batch-collect'. Stop with Ctrl+C.
+    """
+    import_dir = Path("import")
+    for folder in [import_dir, Path("complete"), Path(output_folder)]:
+        folder.mkdir(exist_ok=True)
+    
+    wake = threading.Event()
+    observer = None
+    if HAS_WATCHDOG:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+        
+        class WakeOnChange(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+        observer = Observer()
+        observer.schedule(WakeOnChange(), str(import_dir))
+        observer.start()
+        print(f"👀 Watching '{import_dir}' for new files (Ctrl+C to stop)...")
+    else:
+        print(f"👀 Watching '{import_dir}' every {WATCH_POLL_SECONDS:g}s (Ctrl+C to stop)...")
+        print(f"   Install watchdog for instant pickup: pip3 install watchdog")
+    
+    pending = {}  # path -> ((size, mtime), when that signature was first seen)
+    failed = {}   # path -> signature when processing failed
+    waiting = set()  # paths held by an open Batch API job
+    try:
+        while True:
+            now = time.monotonic()
+            ready = []
+            current = set(list_import_files(import_dir))
+            held = files_in_open_batch_jobs()
+            for path in current:
+                if path.name in held:
+                    if path not in waiting:
+                        print(f"⏳ {path.name} is waiting on a batch job - left for 'python main.py batch-collect'")
+                    waiting.add(path)
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue  # Moved or deleted while scanning
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if failed.get(path) == signature:
+                    continue
+                if path not in pending or pending[path][0] != signature:
+                    pending[path] = (signature, now)
+                elif stat.st_size and now - pending[path][1] >= WATCH_SETTLE_SECONDS:
+                    ready.append(path)
+            pending = {path: entry for path, entry in pending.items() if path in current}
+            failed = {path: signature for path, signature in failed.items() if path in current}
+            waiting = {path for path in waiting if path in current and path.name in held}
+            
+            if ready:
+                print(f"\n🔍 {len(ready)} new file(s) ready in '{import_dir}'")
+                processed_count, created_files = process_files(sorted(ready), output_folder, jobs)
+                print(f"🎉 {processed_count}/{len(ready)} file(s) processed, {len(created_files)} InDesign file(s) created")
+                for path in ready:
+                    signature = pending.pop(path)[0]
+                    if path.exists():
+                        failed[path] = signature
+                print(f"👀 Waiting for more files...")
+            
+            # Filesystem events wake us immediately; otherwise re-check on the poll interval
+            if observer is None:
+                timeout = WATCH_POLL_SECONDS
+            elif pending:
+                timeout = min(WATCH_POLL_SECONDS, WATCH_SETTLE_SECONDS)
+            elif waiting:
+                timeout = WATCH_POLL_SECONDS  # a batch job can release its files without touching 'import'
+            else:
+                timeout = None
+            wake.wait(timeout)
+            wake.clear()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching.")
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+def _batch_job_states():
+    """(path, state) for every Batch API job not yet fully collected, oldest first"""
+    states = []
+    for path in sorted(BATCH_API_DIR.glob("*.json")):
+        state = _load_json(path)
+        if isinstance(state, dict) and state.get("status") != "collected":
+            states.append((path, state))
+    return states
+
+def files_in_open_batch_jobs():
+    """Names of import files waiting on a Batch API job - they must not be extracted twice"""
+    return {name for _, state in _batch_job_states()
+            for name, entry in state["files"].items() if entry["status"] == "pending"}
+
+def _submit_batch_requests(state_path, state):
+    """Upload the job's request file and create the batch, saving progress after each step"""
+    client = get_openai_client()
+    if not state.get("input_file_id"):
+        with open(state_path.with_suffix(".jsonl"), "rb") as f:
+            state["input_file_id"] = client.files.create(file=f, purpose="batch").id
+        write_json_atomic(state_path, state)
+        print(f"📤 Uploaded {state['request_count']} request(s) as {state['input_file_id']}")
+    batch = client.batches.create(input_file_id=state["input_file_id"], endpoint="/v1/chat/completions",
+                                  completion_window="24h")
+    state["batch_id"], state["status"] = batch.id, "submitted"
+    write_json_atomic(state_path, state)
+    print(f"📦 Submitted batch {batch.id} - run 'python main.py batch-collect' later to fetch the results")
+
+def submit_batch_job(output_folder="in_design_output"):
+    """Queue every file in 'import' as one OpenAI Batch API job instead of calling the API per file
+
+    Files the local parser or the AI cache can already handle are processed straight away.
+    Rerunning after an interruption resumes the unsubmitted job rather than building a new one.
+    """
+    for folder in [Path("import"), Path("complete"), Path(output_folder)]:
+        folder.mkdir(exist_ok=True)
+    
+    for state_path, state in _batch_job_states():
+        if not state.get("batch_id"):
+            print(f"🔁 Resuming unsubmitted batch job {state['id']}")
+            _submit_batch_requests(state_path, state)
+            return
+    
+    held = files_in_open_batch_jobs()
+    files = [f for f in list_import_files() if f.name not in held]
+    if not files:
+        print("📁 No new PDF or image files to queue in the 'import' folder.")
+        return
+    
+    job_id = datetime.now().strftime("batch_%Y%m%d_%H%M%S")
+    state = {"id": job_id, "status": "prepared", "created": datetime.now().isoformat(timespec="seconds"),
+             "model": AI_MODEL, "prompt_version": AI_PROMPT_VERSION, "files": {}, "results": {}}
+    ready_now, requests = [], []
+    for file_index, file in enumerate(files):
+        print(f"\n📄 Preparing: {file.name}")
+        try:
+            pages = extract_pages(file, PAGE_WORKERS)
+        except Exception as e:
+            print(f"❌ Error extracting {file.name}: {str(e)}")
+            continue
+        if not any(page["text"].strip() for page in pages):
+            print(f"⚠️  No text could be extracted from {file.name} - skipped")
+            continue
+        if try_local_parse(pages) is not None:
+            ready_now.append(file)
+            continue
+        
+        chunk_entries = []
+        for chunk_index, (chunk, doc_type) in enumerate(prepare_ai_chunks([page["text"] for page in pages])):
+            key = ai_cache_key(chunk, doc_type)
+            entry = {"custom_id": f"{file_index}-{chunk_index}", "cache_key": key}
+            cached = load_cached_response(key) if AI_CACHE_MODE == "on" else None
+            if cached is not None:
+                state["results"][entry["custom_id"]] = cached
+            else:
+                requests.append({"custom_id": entry["custom_id"], "method": "POST",
+                                 "url": "/v1/chat/completions", "body": build_ai_request(chunk, doc_type)})
+            chunk_entries.append(entry)
+        if all(entry["custom_id"] in state["results"] for entry in chunk_entries):
+            ready_now.append(file)
+            continue
+        state["files"][file.name] = {"chunks": chunk_entries, "status": "pending"}
+        print(f"🧾 Queued {len(chunk_entries)} request(s)")
+    
+    if ready_now:
+        print(f"\n⚡ {len(ready_now)} file(s) need no AI call - processing now")
+        process_files(ready_now, output_folder)
+    if not requests:
+        return
+    
+    BATCH_API_DIR.mkdir(parents=True, exist_ok=True)
+    state_path = BATCH_API_DIR / f"{job_id}.json"
+    with open(state_path.with_suffix(".jsonl"), "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request) + "\n")
+    state["request_count"] = len(requests)
+    write_json_atomic(state_path, state)
+    print(f"\n🗂️  Wrote {len(requests)} request(s) for {len(state['files'])} file(s) to {state_path.with_suffix('.jsonl')}")
+    _submit_batch_requests(state_path, state)
+
+def _download_batch_results(client, batch, state):
+    """Parse the batch output (and error) files into state['results'] / state['errors']"""
+    usage = {"prompt_tokens": 0, "completion_tokens": 0}
+    errors = state.setdefault("errors", {})
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            custom_id = item["custom_id"]
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                errors[custom_id] = item.get("error") or response.get("body")
+                continue
+            body = response["body"]
+            for field in usage:
+                usage[field] += (body.get("usage") or {}).get(field, 0)
+            try:
+                state["results"][custom_id] = parse_ai_json(body["choices"][0]["message"]["content"])
+            except json.JSONDecodeError:
+                errors[custom_id] = "response was not valid JSON"
+    state["usage"] = usage
+    
+    # Batch pricing is half the interactive rate
+    prompt_cost = usage["prompt_tokens"] * 0.00025 / 1000
+    completion_cost = usage["completion_tokens"] * 0.00075 / 1000
+    print(f"📊 Batch Usage - Tokens: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion")
+    print(f"💰 Estimated Cost: ${prompt_cost + completion_cost:.4f} (${prompt_cost:.4f} prompt + ${completion_cost:.4f} completion)")
+
+def collect_batch_jobs(output_folder="in_design_output"):
+    """Fetch finished Batch API jobs and write their InDesign files; safe to rerun at any point
+
+    Returns the number of InDesign files created.
+    """
+    states = _batch_job_states()
+    if not states:
+        print("📭 No open batch jobs.")
+        return 0
+    
+    client = get_openai_client()
+    all_created_files = []
+    for state_path, state in states:
+        if not state.get("batch_id"):
+            print(f"⚠️  Batch job {state['id']} was never submitted - run 'python main.py batch-submit' to resume it")
+            continue
+        batch = client.batches.retrieve(state["batch_id"])
+        counts = batch.request_counts
+        print(f"\n📦 Batch job {state['id']}: {batch.status}"
+              + (f" ({counts.completed}/{counts.total} requests done)" if counts else ""))
+        if batch.status not in ("completed", "expired", "cancelled"):
+            if batch.status == "failed":
+                print(f"❌ Batch failed: {batch.errors} - the files are still in 'import'")
+                state["status"] = "collected"
+                write_json_atomic(state_path, state)
+            continue
+        
+        if state["status"] != "downloaded":
+            _download_batch_results(client, batch, state)
+            # Keep the results for future reruns of the same text
+            for entry in (c for f in state["files"].values() for c in f["chunks"]):
+                data = state["results"].get(entry["custom_id"])
+                if isinstance(data, dict) and data.get("type") in ("roster", "schedule"):
+                    store_cached_response(entry["cache_key"], data)
+            state["status"] = "downloaded"
+            write_json_atomic(state_path, state)
+        
+        for name, entry in state["files"].items():
+            if entry["status"] != "pending":
+                continue
+            file = Path("import") / name
+            print(f"\n📄 Processing: {name}")
+            results = [state["results"].get(c["custom_id"]) for c in entry["chunks"]]
+            if not all(isinstance(r, dict) and r.get("type") in ("roster", "schedule") for r in results):
+                missing = sum(1 for r in results if not isinstance(r, dict))
+                print(f"⚠️  {missing or 'Some'} request(s) for {name} failed - left in 'import' for a normal run")
+                entry["status"] = "failed"
+            elif not file.exists():
+                print(f"⚠️  {name} is no longer in 'import' - skipped")
+                entry["status"] = "failed"
+            else:
+                data = results[0] if len(results) == 1 else merge_chunk_results(results)
+                created_files, success = render_document_data(data, file, Path(output_folder))
+                if success:
+                    all_created_files.extend(created_files)
+                    shutil.move(str(file), str(Path("complete") / file.name))
+                    print(f"📁 Moved {file.name} to 'complete' folder")
+                entry["status"] = "done" if success else "failed"
+            write_json_atomic(state_path, state)
+        
+        state["status"] = "collected"
+        write_json_atomic(state_path, state)
+    
+    compact_manifest()
+    print(f"\n🔢 TOTAL FILES CREATED IN THIS RUN: {len(all_created_files)}")
+    return len(all_created_files)
+
+def renderer_version():
+    """Hash of the code, profile and tables that turn extracted data into InDesign text - changes whenever output would"""
+    return _renderer_version(RENDER_PROFILE_PATH, COMBINED_OUTPUT)
+
+@lru_cache(maxsize=None)
+def _renderer_version(profile_path, combined_output):
+    digest = hashlib.sha256()
+    for func in (render_document_data, process_roster_data, process_schedule_data, roster_team_lines,
+                 schedule_team_lines, combined_output_file, normalize_player_data, RenderProfile, write_outputs_atomic):
+        digest.update(inspect.getsource(func).encode("utf-8"))
+    digest.update(json.dumps([current_render_profile().settings, PLAYER_KEY_MAPPING, COMBINED_OUTPUT],
+                             sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def _manifest_log_path():
+    return MANIFEST_PATH.with_name(MANIFEST_PATH.name + ".log")
+
+def manifest_key(file_path, output_folder):
+    """A source file rendered into an output folder - the same file rendered into two folders is two entries"""
+    return f"{os.path.abspath(output_folder)} <- {os.path.abspath(file_path)}"
+
+def _read_manifest_files(log_paths):
+    """The manifest snapshot with every logged entry applied, in order"""
+    manifest = {}
+    for key, entry in (_load_json(MANIFEST_PATH) or {}).items():
+        if "source" not in entry:
+            # Entries written before they were keyed by output folder were keyed by file name
+            entry["source"] = key
+            key = manifest_key(key, entry["output_folder"])
+        manifest[key] = entry
+    for log_path in log_paths:
+        try:
+            with open(log_path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            continue
+        for line in lines:
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by a crash
+            manifest[item["key"]] = item["entry"]
+    return manifest
+
+def load_manifest():
+    """The manifest, keyed by manifest_key - read from disk once, then kept in memory"""
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            _manifest = _read_manifest_files([_manifest_log_path()])
+        return _manifest
+
+def compact_manifest():
+    """Fold the entries logged since the last batch into MANIFEST_PATH and start a new log"""
+    global _manifest
+    log_path = _manifest_log_path()
+    if not log_path.exists():
+        return
+    with _manifest_lock:
+        # Other runs may have logged entries too, so rebuild from disk rather than memory
+        compacting = log_path.with_name(log_path.name + ".compacting")
+        logs = [compacting] if compacting.exists() else []
+        if log_path.exists():
+            if logs:
+                logs.append(log_path)
+            else:
+                os.replace(log_path, compacting)
+                logs = [compacting]
+        _manifest = _read_manifest_files(logs)
+        write_json_atomic(MANIFEST_PATH, _manifest)
+        for path in logs:
+            path.unlink(missing_ok=True)
+
+def _output_prefix(output_name):
+    """Output file name without its date - names the team (or combined file) it holds"""
+    return re.sub(r"_\d{2}_\d{2}_\d{4}\.txt$", "", output_name)
+
+def _document_output_prefixes(file_path, data):
+    """Prefixes of every output data can produce - one per team or schedule plus the combined file"""
+    stem = Path(file_path).stem
+    kind = "roster" if data.get("type") == "roster" else "schedule"
+    items = data.get("teams" if kind == "roster" else "schedules") or []
+    prefixes = {f"{stem}_{str(item.get('sport', 'unknown')).lower().replace(' ', '_')}_{kind}"
+                for item in items if isinstance(item, dict)}
+    return prefixes | {f"{stem}_all_{kind}s"}
+
+def record_manifest_entry(file_path, data, output_folder, created_files, source_hash=None):
+    """Store what was extracted from a source file and which outputs it produced
+
+    The entry is appended to the manifest log (compact_manifest folds it in later), so a
+    crash loses nothing and a big batch never rewrites the whole manifest per file.
+    Outputs of the previous entry are kept for teams that were skipped as unchanged this time,
+    so 'rebuild' still notices when they go missing.
+    """
+    file_path = Path(file_path)
+    if source_hash is None:
+        source_hash = file_sha256(file_path)
+    manifest = load_manifest()
+    key = manifest_key(file_path, output_folder)
+    entry = {
+        "source": str(file_path),
+        "source_hash": source_hash,
+        "data": data,
+        "output_folder": str(output_folder),
+        "outputs": list(created_files),
+        "renderer_version": renderer_version(),
+        "rendered_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    with _manifest_lock:
+        previous = manifest.get(key)
+        if previous:
+            skipped = _document_output_prefixes(file_path, data) - {_output_prefix(f) for f in created_files}
+            entry["outputs"] += [f for f in previous["outputs"] if _output_prefix(f) in skipped and f not in entry["outputs"]]
+        manifest[key] = entry
+        with open(_manifest_log_path(), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "entry": entry}) + "\n")
+
+def _find_source_file(entry):
+    """Where a manifest entry's source is now - batch files move from 'import' to 'complete'"""
+    name = Path(entry["source"]).name
+    for path in (Path(entry["source"]), Path("complete") / name, Path("import") / name):
+        if path.exists():
+            return path
+    return None
+
+def rebuild_outputs(force=False):
+    """Re-render outputs from the manifest's stored data - no text extraction and no AI calls
+
+    An entry is re-rendered when the renderer has changed since it was written, one of its
+    outputs is missing, or force is set. Sources whose contents changed since extraction are
+    moved back to 'import' so the next batch run extracts them again.
+    """
+    manifest = load_manifest()
+    if not manifest:
+        print(f"📁 Nothing to rebuild - {MANIFEST_PATH} is empty or missing (run batch mode first)")
+        return 0
+    
+    version = renderer_version()
+    rebuilt = reextract = 0
+    all_created_files = []
+    for key, entry in list(manifest.items()):
+        output_folder = Path(entry["output_folder"])
+        name = Path(entry["source"]).name
+        source = _find_source_file(entry)
+        if source is not None and source.parent.name == "complete" and file_sha256(source) != entry["source_hash"]:
+            Path("import").mkdir(exist_ok=True)
+            shutil.move(str(source), str(Path("import") / name))
+            print(f"🔁 {name} changed since it was extracted - moved back to 'import' for the next batch run")
+            reextract += 1
+            continue
+        
+        missing = [f for f in entry["outputs"] if not (output_folder / f).exists()]
+        if force:
+            reason = "forced"
+        elif entry["renderer_version"] != version:
+            reason = "renderer changed"
+        elif missing:
+            reason = f"{len(missing)} output(s) missing"
+        else:
+            continue
+        
+        print(f"\n🔄 Rebuilding {name} ({reason})")
+        output_folder.mkdir(parents=True, exist_ok=True)
+        created_files, success = render_document_data(entry["data"], Path(entry["source"]), output_folder, entry["source_hash"],
+                                                      skip_unchanged=False)
+        if not success:
+            continue
+        # Outputs are named by date, so a rebuild on a later day supersedes the old files
+        for old_file in set(entry["outputs"]) - set(created_files):
+            (output_folder / old_file).unlink(missing_ok=True)
+        all_created_files.extend(created_files)
+        rebuilt += 1
+    compact_manifest()
+    
+    print(f"\n🎉 Rebuild complete! {rebuilt} source file(s) re-rendered, {len(manifest) - rebuilt - reextract} already up to date.")
+    if reextract:
+        print(f"📥 {reextract} changed source file(s) are waiting in 'import' - run batch mode to extract them")
+    print(f"🔢 TOTAL FILES CREATED IN THIS RUN: {len(all_created_files)}")
+    return len(all_created_files)
+
+TEAM_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS teams (
+    school TEXT NOT NULL,
+    sport TEXT NOT NULL,
+    season TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    content TEXT NOT NULL,
+    source TEXT NOT NULL,
+    stored_at TEXT NOT NULL,
+    PRIMARY KEY (school, sport, season, kind, version)
+);
+CREATE INDEX IF NOT EXISTS teams_by_hash ON teams (kind, content_hash);
+"""
+
+# Year ranges, copy numbers and words that differ between versions of the same school's file
+_SOURCE_NAME_NOISE = re.compile(r"\b(?:19|20)\d{2}(?:\s*[-/]\s*\d{2,4})?\b|\(\d+\)"
+                                r"|\b(?:rosters?|schedules?|final|updated?|revised|new|copy|v\d+)\b", re.IGNORECASE)
+
+@contextmanager
+def team_store():
+    """Use the shared team store connection (created on first use) and commit when the block succeeds"""
+    global _team_store_conn
+    with _team_store_lock:
+        if _team_store_conn is None:
+            _team_store_conn = sqlite3.connect(TEAM_STORE_PATH, check_same_thread=False)
+            _team_store_conn.executescript(TEAM_STORE_SCHEMA)
+        with _team_store_conn:
+            yield _team_store_conn
+
+def team_identity(source_path, sport):
+    """(school, sport/level, season) a team is stored under - school and season come from the source file name"""
+    stem = Path(source_path).stem
+    season = re.search(r"\b(?:19|20)\d{2}\b", stem)
+    school = re.sub(r"[\W_]+", " ", _SOURCE_NAME_NOISE.sub(" ", stem)).strip().lower()
+    sport_level = re.sub(r"\s+", " ", str(sport or "unknown")).strip().lower().replace("junior varsity", "jv")
+    return school or stem.lower(), sport_level, season.group(0) if season else str(datetime.now().year)
+
+def _team_entry_key(kind, entry):
+    if kind == "roster":
+        return re.sub(r"\s+", " ", str(entry.get("name", ""))).strip().lower()
+    return f"{entry.get('date', '')} {str(entry.get('opponent', '')).strip().lower()}"
+
+def diff_team_content(kind, old, new):
+    """Return (added, removed, changed) player names or game keys between two stored versions of a team"""
+    field = "players" if kind == "roster" else "games"
+    old_entries = {_team_entry_key(kind, e): e for e in old.get(field, [])}
+    new_entries = {_team_entry_key(kind, e): e for e in new.get(field, [])}
+    added = [key for key in new_entries if key not in old_entries]
+    removed = [key for key in old_entries if key not in new_entries]
+    changed = [key for key in new_entries if key in old_entries and new_entries[key] != old_entries[key]]
+    if kind == "roster" and old.get("coaches") != new.get("coaches"):
+        changed.append("coaches")
+    return added, removed, changed
+
+def store_team_version(kind, source_path, sport, content):
+    """Compare a normalized team with the store and save it as a new version unless it is unchanged
+
+    The comparison and the insert run in one locked transaction, so concurrent files (or two
+    teams of one document with the same identity) never both count as new or share a version.
+    Returns a dict with the team's identity, content hash, stored version (None when unchanged)
+    and a status: 'new', 'changed', 'unchanged' (same as its latest stored version) or
+    'duplicate' (first seen here, but the same content is stored for another school/sport/season),
+    plus the previous version when there is one.
+    """
+    identity = team_identity(source_path, sport)
+    content_json = json.dumps(content, sort_keys=True)
+    content_hash = hashlib.sha256(content_json.encode("utf-8")).hexdigest()
+    result = {"kind": kind, "identity": identity, "hash": content_hash, "content": content,
+              "source": os.path.abspath(source_path), "previous": None, "version": None}
+    with team_store() as conn:
+        conn.execute("BEGIN IMMEDIATE")  # also keeps a second main.py from interleaving
+        previous = conn.execute(
+            "SELECT version, content_hash, content, source FROM teams"
+            " WHERE school = ? AND sport = ? AND season = ? AND kind = ? ORDER BY version DESC LIMIT 1",
+            (*identity, kind)).fetchone()
+        duplicate = conn.execute(
+            "SELECT school, sport, season, source FROM teams WHERE kind = ? AND content_hash = ?"
+            " AND NOT (school = ? AND sport = ? AND season = ?) LIMIT 1",
+            (kind, content_hash, *identity)).fetchone()
+        if previous:
+            result["previous"] = {"version": previous[0], "content": json.loads(previous[2]), "source": previous[3]}
+        if previous and previous[1] == content_hash:
+            result["status"] = "unchanged"
+            return result
+        if duplicate and not previous:
+            result["status"] = "duplicate"
+            result["duplicate_of"] = duplicate
+        else:
+            result["status"] = "changed" if previous else "new"
+        result["version"] = conn.execute(
+            "SELECT COALESCE(MAX(version), 0) + 1 FROM teams WHERE school = ? AND sport = ? AND season = ? AND kind = ?",
+            (*identity, kind)).fetchone()[0]
+        conn.execute("INSERT INTO teams VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (*identity, kind, result["version"], content_hash, content_json, result["source"],
+                      datetime.now().isoformat(timespec="seconds")))
+    return result
+
+def earlier_output_exists(checked, output_folder):
+    """Whether the output an unchanged or duplicate team was last rendered to is still in output_folder
+
+    Looks up the manifest entry of the source the stored version came from, so a team is only
+    skipped while the file holding it is actually there to reuse.
+    """
+    if checked["status"] == "unchanged":
+        source, sport_level = checked["previous"]["source"], checked["identity"][1]
+    elif checked["status"] == "duplicate":
+        source, sport_level = checked["duplicate_of"][3], checked["duplicate_of"][1]
+    else:
+        return False
+    entry = load_manifest().get(manifest_key(source, output_folder))
+    if not entry:
+        return False
+    kind = checked["kind"]
+    items = entry["data"].get("teams" if kind == "roster" else "schedules") or []
+    prefixes = {f"{Path(source).stem}_{str(item.get('sport', 'unknown')).lower().replace(' ', '_')}_{kind}"
+                for item in items if isinstance(item, dict) and team_identity(source, item.get("sport"))[1] == sport_level}
+    return any(_output_prefix(f) in prefixes and (Path(output_folder) / f).exists() for f in entry["outputs"])
+
+def report_team_status(label, checked, skipped):
+    """Print how a team compares with its stored version"""
+    previous = checked["previous"]
+    icon = "⏭️ " if skipped else "♻️ "
+    if checked["status"] == "unchanged":
+        print(f"{icon} {label} unchanged since version {previous['version']} ({Path(previous['source']).name})")
+    elif checked["status"] == "duplicate":
+        school, sport, season, source = checked["duplicate_of"]
+        print(f"{icon} {label} is identical to {school} {sport} {season} ({Path(source).name})")
+    elif checked["status"] == "changed":
+        added, removed, changed = diff_team_content(checked["kind"], previous["content"], checked["content"])
+        print(f"🔀 {label} changed since version {previous['version']} ({Path(previous['source']).name}): "
+              f"{len(added)} added, {len(removed)} removed, {len(changed)} updated")
+        for sign, keys in (("+", added), ("-", removed), ("~", changed)):
+            for key in keys[:10]:
+                print(f"   {sign} {key}")
+            if len(keys) > 10:
+                print(f"   {sign} ... {len(keys) - 10} more")
+
+def discard_team_versions(stored_teams):
+    """Remove versions saved by store_team_version whose outputs could not be written"""
+    with team_store() as conn:
+        for stored in stored_teams:
+            if stored["version"] is not None:
+                conn.execute("DELETE FROM teams WHERE school = ? AND sport = ? AND season = ? AND kind = ? AND version = ?",
+                             (*stored["identity"], stored["kind"], stored["version"]))
+
+def lookup_teams(search=""):
+    """Print the latest stored version of every team whose school, sport or season matches search"""
+    if not TEAM_STORE_PATH.exists():
+        print(f"📁 {TEAM_STORE_PATH} does not exist yet - run batch mode first")
+        return 0
+    pattern = f"%{search.lower()}%"
+    with team_store() as conn:
+        rows = conn.execute(
+            "SELECT school, sport, season, kind, MAX(version), content, source, stored_at FROM teams"
+            " WHERE school LIKE ? OR sport LIKE ? OR season LIKE ?"
+            " GROUP BY school, sport, season, kind ORDER BY school, season, sport",
+            (pattern, pattern, pattern)).fetchall()
+    for school, sport, season, kind, version, content, source, stored_at in rows:
+        entries = json.loads(content).get("players" if kind == "roster" else "games", [])
+        unit = "player(s)" if kind == "roster" else "game(s)"
+        print(f"🏫 {school} | {sport} | {season} | {kind} v{version}: {len(entries)} {unit} from {Path(source).name} ({stored_at})")
+    print(f"🔢 {len(rows)} team(s) found")
+    return len(rows)
+
+def _pop_option(args, name, default=None):
+    """Remove '--name value' from args and return the value (or default when absent)"""
+    if name not in args:
+        return default
+    index = args.index(name)
+    if index + 1 >= len(args):
+        print(f"Error: {name} needs a value.")
+        sys.exit(1)
+    value = args[index + 1]
+    del args[index:index + 2]
+    return value
+
+def _pop_flag(args, name):
+    """Remove a '--name' switch from args and report whether it was given"""
+    if name in args:
+        args.remove(name)
+        return True
+    return False
+
 if __name__ == "__main__":
-    import sys
+    args = sys.argv[1:]
+    jobs = int(_pop_option(args, "--jobs", BATCH_JOBS))
+    if _pop_flag(args, "--ai-only"):
+        LOCAL_PARSE_ENABLED = False
+    RENDER_PROFILE_PATH = _pop_option(args, "--profile", RENDER_PROFILE_PATH)
+    if _pop_flag(args, "--combined"):
+        COMBINED_OUTPUT = True
+    if _pop_flag(args, "--render-all"):
+        SKIP_UNCHANGED_TEAMS = False
+    if _pop_flag(args, "--no-cache"):
+        AI_CACHE_MODE = "off"
+    elif _pop_flag(args, "--refresh-cache"):
+        AI_CACHE_MODE = "refresh"
     
-    if len(sys.argv) == 1:
+    if len(args) == 0:
         # Batch processing mode
         print("🔄 Starting batch processing mode...")
-        process_pdfs()
-    elif len(sys.argv) == 3:
+        process_pdfs(jobs=jobs)
+    elif args == ["batch-submit"]:
+        # Overnight mode - queue everything as one Batch API job
+        submit_batch_job()
+    elif args == ["batch-collect"]:
+        collect_batch_jobs()
+    elif args in (["rebuild"], ["rebuild", "--all"]):
+        # Re-render outputs from stored data after a template change
+        rebuild_outputs(force=args[-1] == "--all")
+    elif args[:1] == ["teams"] and len(args) <= 2:
+        # Look up stored teams by school, sport/level or season
+        lookup_teams(args[1] if len(args) == 2 else "")
+    elif args == ["watch"]:
+        # Daemon mode - keep running and process files as they arrive
+        watch_import_folder(jobs=jobs)
+    elif len(args) == 2:
         # Single file processing mode
-        input_pdf, output_folder = sys.argv[1], sys.argv[2]
+        input_pdf, output_folder = args[0], args[1]
+        # An explicitly requested file is always written, even if its teams are unchanged
+        SKIP_UNCHANGED_TEAMS = False
         process_pdfs([Path(input_pdf)], output_folder)
     else:
         print("Usage:")
-        print("  Batch mode:     python main.py")
-        print("  Single file:    python main.py <input_file> <output_folder>")
+        print("  Batch mode:     python main.py [--jobs N] [--no-cache | --refresh-cache]")
+        print("  Single file:    python main.py <input_file> <output_folder> [--no-cache | --refresh-cache]")
+        print("  Watch folder:   python main.py watch [--jobs N]")
+        print("  Batch API:      python main.py batch-submit, later python main.py batch-collect")
+        print("  Rebuild:        python main.py rebuild [--all]")
+        print("  Stored teams:   python main.py teams [SEARCH]")
         print("")
         print("Batch mode processes all PDF and image files in the 'import' folder")
         print("and saves InDesign files to 'in_design_output' folder.")
+        print("--jobs N processes N files at once (default: ABC_BATCH_JOBS or 1).")
+        print("--no-cache skips the AI response cache; --refresh-cache re-extracts and updates it.")
+        print("--ai-only sends every file to the AI, even clean roster tables that parse locally.")
+        print("rebuild re-renders outputs from stored data when the renderer changed (--all: every file).")
+        print("--profile FILE uses the styles, columns and abbreviations in a JSON output profile.")
+        print("--combined also writes one file with every team of a multi-team document.")
+        print("--render-all writes every team, even ones unchanged since they were last rendered.")
         print("Supports both ROSTERS and SCHEDULES:")
         print("  - Rosters: Creates separate files for each sport")
         print("  - Schedules: Creates separate files for each sport")
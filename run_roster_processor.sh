@@ -26,15 +26,15 @@ if [ ! -d "import" ]; then
     mkdir -p import
 fi
 
-PDF_COUNT=$(find import -name "*.pdf" -type f | wc -l)
+PDF_COUNT=$(find import -maxdepth 1 -type f \( -iname "*.pdf" -o -iname "*.png" -o -iname "*.jpg" -o -iname "*.jpeg" -o -iname "*.bmp" -o -iname "*.tif" -o -iname "*.tiff" -o -iname "*.gif" \) | wc -l)
 
 if [ $PDF_COUNT -eq 0 ]; then
-    osascript -e 'display dialog "No PDF files found in the import folder. Please add roster or schedule PDF files to the import folder and try again." buttons {"OK"} default button "OK"'
+    osascript -e 'display dialog "No PDF or image files found in the import folder. Please add roster or schedule files to the import folder and try again." buttons {"OK"} default button "OK"'
     exit 1
 fi
 
 # Show processing dialog
-osascript -e 'display dialog "Found '$PDF_COUNT' PDF file(s) to process. Click OK to start processing rosters and schedules." buttons {"Cancel", "Process"} default button "Process"'
+osascript -e 'display dialog "Found '$PDF_COUNT' file(s) to process. Click OK to start processing rosters and schedules." buttons {"Cancel", "Process"} default button "Process"'
 
 if [ $? -ne 0 ]; then
     exit 0
@@ -42,7 +42,7 @@ fi
 
 # Run the Python script
 echo "Starting ABC Advertising Roster & Schedule Processor..."
-echo "Processing $PDF_COUNT PDF file(s)..."
+echo "Processing $PDF_COUNT file(s)..."
 
 # Run the main script
 $PYTHON_CMD main.py